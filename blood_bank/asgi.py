@@ -13,4 +13,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blood_bank.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from blood_bank_app.events import EVENTS_PATH, sse_application
+from blood_bank_app.expiry import start_expiry_sweeper
+
+start_expiry_sweeper()
+
+
+async def application(scope, receive, send):
+    # The event stream is long-lived, so it bypasses Django's request cycle and
+    # runs as a coroutine rather than holding a worker thread per client.
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        return await sse_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -24,7 +24,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-+o-kdsoy0_7ve6=@e4f5#oow+n10u53wz86@7!ankf00%rh2r5'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', 'True') == 'True'
 
 # ALLOWED_HOSTS = []
 
@@ -54,6 +54,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'blood_bank_app.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,12 +65,20 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': ['templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept for the life of the process; runserver's
+            # autoreloader still resets them when a template file changes.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'blood_bank_app.events.event_stream',
             ],
         },
     },
@@ -85,9 +94,44 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN so concurrent stock mutations queue on the
+            # busy timeout instead of deadlocking on a SHARED -> RESERVED upgrade.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'TEST': {
+            # File-backed so the concurrency tests exercise real SQLite locking.
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# WAL lets readers run alongside the writer, but it converts the database file for
+# good, so a deployment opts in with SQLITE_WAL=True. The stress tests switch their
+# own test database to WAL.
+if os.environ.get('SQLITE_WAL') == 'True':
+    DATABASES['default']['OPTIONS']['init_command'] = 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default. Point CACHE_BACKEND/CACHE_LOCATION at Redis or Memcached
+# to share snapshots and chart images between worker processes; the versions that
+# invalidate them live in the database either way.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+    # {% cache %} fragments (navigation, stock table). Process-local on purpose: a
+    # deploy restarts the workers, so stale markup never outlives the templates.
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template-fragments',
+    },
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -108,6 +152,28 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# The first hasher hashes new passwords; the others still verify older hashes.
+
+PASSWORD_HASHERS = [
+    'blood_bank_app.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# PBKDF2 iterations (0 keeps Django's default). A login rehashes a password stored
+# with fewer iterations, never one stored with more. Fewer iterations buy logins per
+# core at the cost of brute-force resistance, so measure with
+# `manage.py bench_logins --iterations`.
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 0))
+
+# Passwords the login and registration views hash at once per process (0 = one per
+# CPU core). Under ASGI the views await the pool, so hashing never holds the event loop.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -126,12 +192,32 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR/'staticfiles'
 STATICFILES_DIRS = [BASE_DIR/'static']
-STATICFILES_STORAGES = 'Whitenoise.storage.CompressedManifestStaticFilesStorage'
+# collectstatic writes content-hashed copies plus .gz/.br siblings (brotli needs the
+# Brotli package); WhiteNoise serves the hashed names with an immutable, one-year max-age.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'blood_bank_app.storage.StaticFilesStorage'},
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Seconds between in-process sweeps of expired blood stock (0 disables the thread;
+# `manage.py sweep_expired_stock` can be scheduled instead). Every worker starts a
+# sweeper thread, but a lease row in the database lets only one sweep per interval.
+EXPIRY_SWEEP_INTERVAL = int(os.environ.get('EXPIRY_SWEEP_INTERVAL', 3600))
+
+# Cache alias holding the stock snapshot read by the home pages.
+STOCK_CACHE_ALIAS = os.environ.get('STOCK_CACHE_ALIAS', 'default')
+
+# Name of a shared memory block holding the stock version and per-group totals for
+# every worker on the host (see blood_bank_app/sharedstock.py). Empty disables it.
+STOCK_SHM_NAME = os.environ.get('STOCK_SHM_NAME', '')
+
+# Seconds a stock hold placed from the admin request queue stays active.
+STOCK_HOLD_TTL = int(os.environ.get('STOCK_HOLD_TTL', 900))
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media' 
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blood_bank.settings')
 
 application = get_wsgi_application()
+
+from blood_bank_app.expiry import start_expiry_sweeper
+
+start_expiry_sweeper()
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import BloodStock, Credential
+from .models import BloodStock, Credential, ExpiredStock, StockHold
 
 admin.site.register(BloodStock)
-admin.site.register(Credential)
\ No newline at end of file
+admin.site.register(Credential)
+admin.site.register(ExpiredStock)
+admin.site.register(StockHold)
@@ -0,0 +1,137 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import compatibility, counters, events, inventory, reservations, scheduler
+from .models import BloodRequest
+
+FIFO = 'fifo'
+URGENCY = 'urgency'
+MAX_FULFILLED = 'max_fulfilled'
+
+UPDATE_CHUNK = 500
+
+# Sort keys deciding who is served first.
+POLICIES = {
+    FIFO: lambda req: (req.created_at, req.pk),
+    URGENCY: lambda req: (-req.urgency, req.created_at, req.pk),
+    # Smallest first maximises the number of requests a fixed stock can cover.
+    MAX_FULFILLED: lambda req: (req.units, req.created_at, req.pk),
+}
+POLICY_CHOICES = [(FIFO, 'Oldest first'), (URGENCY, 'Most urgent first'), (MAX_FULFILLED, 'Most requests filled')]
+
+
+def plan(requests, balances, policy=FIFO, substitute=True):
+    """Match ``requests`` against ``{blood_group: units}`` without touching the database.
+
+    Every request is first offered its own group, in policy order. What is left then
+    covers the rest from compatible groups (see ``compatibility.PREFERENCE``), so
+    substitution never takes stock an exact match was waiting for.
+
+    Returns ``(granted, short)``: ``(request, {blood_group: units})`` draws, and
+    ``(request, available)`` pairs for the requests stock cannot cover.
+    """
+    balances = dict(balances)
+    granted, waiting = [], []
+    for req in sorted(requests, key=POLICIES[policy]):
+        if req.units <= balances.get(req.blood_group, 0):
+            balances[req.blood_group] -= req.units
+            granted.append((req, {req.blood_group: req.units}))
+        else:
+            waiting.append(req)
+
+    short = []
+    for req in waiting:
+        draws = compatibility.draw(req.blood_group, req.units, balances) if substitute else None
+        if draws is None:
+            short.append((req, balances.get(req.blood_group, 0)))
+            continue
+        for blood_group, units in draws.items():
+            balances[blood_group] -= units
+        granted.append((req, draws))
+    return granted, short
+
+
+def _provided_message(req, draws):
+    if list(draws) == [req.blood_group]:
+        return f"{req.units} units of {req.blood_group} provided successfully."
+    parts = ', '.join(f"{units} × {blood_group}" for blood_group, units in draws.items())
+    return f"{req.units} units provided successfully for {req.blood_group} ({parts})."
+
+
+def _shortage_message(req, available):
+    return (
+        f"⚠️ Not enough {req.blood_group} stock available. "
+        f"Requested: {req.units}, Available: {available}. Please try again later."
+    )
+
+
+def apply_plan(requests, granted, short):
+    """Write a plan: one ``allocate`` per blood group for the units drawn from it, then
+    one UPDATE per distinct (status, admin_message) outcome. Requests whose outcome is
+    unchanged, such as those still short by the same amount, are neither written nor
+    published. Returns ``(accepted, short)``.
+
+    Raises InsufficientStock, undoing everything, if stock moved since it was planned.
+    """
+    before = {req.pk: (req.status, req.admin_message) for req in requests}
+    totals = defaultdict(int)
+    for _, draws in granted:
+        for blood_group, units in draws.items():
+            totals[blood_group] += units
+    for blood_group, units in totals.items():
+        inventory.allocate(blood_group, units)
+
+    for req, draws in granted:
+        req.status = 'Accepted'
+        req.admin_message = _provided_message(req, draws)
+    for req, available in short:
+        req.status = 'Pending'
+        req.admin_message = _shortage_message(req, available)
+
+    # Outcomes repeat across requests, so grouping them beats bulk_update's
+    # per-row CASE, which gets slow to build past a few hundred rows.
+    changed = [req for req in requests if (req.status, req.admin_message) != before[req.pk]]
+    outcomes = defaultdict(list)
+    for req in changed:
+        outcomes[req.status, req.admin_message].append(req.pk)
+    now = timezone.now()
+    for (status, admin_message), pks in outcomes.items():
+        for start in range(0, len(pks), UPDATE_CHUNK):
+            BloodRequest.objects.filter(pk__in=pks[start:start + UPDATE_CHUNK]).update(
+                status=status, admin_message=admin_message, updated_at=now
+            )
+    counters.record_many(
+        counters.BLOOD_REQUEST, [(r.user_id, r.role, before[r.pk][0], r.status, 1) for r in changed]
+    )
+    reservations.release([req for req, _ in granted])
+    scheduler.queue.changed(changed)
+    events.rows_changed(changed)
+    return [req for req, _ in granted], [req for req, _ in short]
+
+
+@transaction.atomic
+def serve(requests, policy=FIFO, substitute=True):
+    """Plan and apply ``requests`` against the live lots, less the units other
+    requests hold; the requests' own holds are theirs to use.
+    """
+    balances = inventory.live_balances(None if substitute else {req.blood_group for req in requests})
+    for blood_group, units in reservations.held_units(exclude_requests=requests).items():
+        if blood_group in balances:
+            balances[blood_group] = max(balances[blood_group] - units, 0)
+    granted, short = plan(requests, balances, policy, substitute)
+    return apply_plan(requests, granted, short)
+
+
+@transaction.atomic
+def allocate_pending(policy=FIFO, ids=None, substitute=True):
+    """Serve the pending blood requests (or those among ``ids``) from stock in one pass:
+    one query for the requests, one for the balances, then ``apply_plan``.
+    """
+    # Every BloodRequest is a Patient or Hospital request, so status alone selects
+    # the queue and keeps the (status, created_at, id) index usable.
+    pending = BloodRequest.objects.select_for_update().filter(status='Pending')
+    if ids is not None:
+        pending = pending.filter(pk__in=ids)
+    return serve(list(pending.order_by('created_at', 'id')), policy, substitute)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BloodBankAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blood_bank_app'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.utils import timezone
+
+from . import allocation, counters, events, inventory, reservations, scheduler
+from .models import BloodRequest, DonorForm
+
+
+def parse_ids(values):
+    """The integer primary keys among ``values`` (e.g. ``request.POST.getlist('ids')``)."""
+    return sorted({int(value) for value in values if str(value).isdigit()})
+
+
+def _pending(model, ids):
+    # One query validates the whole selection: ids that do not exist or have
+    # already been decided are simply not returned.
+    return list(
+        model.objects.select_for_update().filter(pk__in=ids, status='Pending').order_by('created_at', 'id')
+    )
+
+
+@transaction.atomic
+def set_donor_status(ids, status, admin):
+    """Approve or reject the pending donor forms in ``ids``. Approvals become one new
+    lot per form, inserted together, and one balance update per blood group.
+    """
+    donors = _pending(DonorForm, ids)
+    now = timezone.now()
+    for donor in donors:
+        donor.status = status
+        donor.approved_by = admin
+        donor.updated_at = now
+    # bulk_update does not apply auto_now, hence the explicit updated_at.
+    DonorForm.objects.bulk_update(donors, ['status', 'approved_by', 'updated_at'])
+    counters.record_many(counters.DONOR_FORM, [(d.user_id, None, 'Pending', status, 1) for d in donors])
+    events.rows_changed(donors)
+    if status == 'Approved':
+        inventory.receive_many([(d.blood_group, d.units, d) for d in donors])
+    return donors
+
+
+@transaction.atomic
+def reject_requests(ids):
+    reqs = _pending(BloodRequest, ids)
+    now = timezone.now()
+    for req in reqs:
+        req.status = 'Rejected'
+        req.updated_at = now
+    BloodRequest.objects.bulk_update(reqs, ['status', 'updated_at'])
+    counters.record_many(counters.BLOOD_REQUEST, [(r.user_id, r.role, 'Pending', 'Rejected', 1) for r in reqs])
+    reservations.release(reqs)
+    scheduler.queue.changed(reqs)
+    events.rows_changed(reqs)
+    return reqs
+
+
+def approve_requests(ids):
+    """Accept the pending blood requests in ``ids``, oldest first, as far as stock allows.
+    Returns ``(accepted, short)``; see ``allocation.allocate_pending``.
+    """
+    return allocation.allocate_pending(allocation.FIFO, ids=ids)
@@ -0,0 +1,162 @@
+import io
+import math
+import threading
+from xml.sax.saxutils import escape
+
+from django.core.cache import cache
+
+from .models import get_stock_version
+from .snapshot import stock_totals
+
+CHART_COLORS = ["#A9A3C5", "#EBC8C0", "#CCDC82", "#C0E3EB", "#CDC0EB", '#EBC0DE', '#DEEBC0', "#C0EBCD"]
+CHART_CACHE_TIMEOUT = 60 * 60 * 24
+
+CONTENT_TYPES = {
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+}
+
+# Serializes cold renders in this process so a stock change triggers one
+# render instead of one per concurrent request.
+_render_lock = threading.Lock()
+
+
+def _point(cx, cy, radius, degrees):
+    theta = math.radians(degrees)
+    return cx + radius * math.cos(theta), cy - radius * math.sin(theta)
+
+
+def _svg_document(width, height, body):
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" role="img" aria-label="Blood Stock" '
+        f'font-family="DejaVu Sans, Arial, sans-serif">{"".join(body)}</svg>'
+    )
+
+
+def _svg_legend(x, y, blood_data):
+    body = [f'<text x="{x}" y="{y}" font-size="13">Blood Stock</text>']
+    for i, ((label, size), color) in enumerate(zip(blood_data.items(), CHART_COLORS)):
+        row = y + 14 + i * 24
+        body.append(f'<rect x="{x}" y="{row}" width="18" height="12" fill="{color}"/>')
+        body.append(f'<text x="{x + 26}" y="{row + 11}" font-size="12">{escape(label)} : {size} ml</text>')
+    return body
+
+
+def render_stock_svg(blood_data, kind='pie'):
+    """Render the per-group breakdown as a standalone SVG document (pie or bar)."""
+    if kind == 'bar':
+        return _render_bar_svg(blood_data)
+    cx, cy, radius = 240, 240, 190
+    total = sum(blood_data.values())
+    body = []
+    if not total:
+        body.append(f'<circle cx="{cx}" cy="{cy}" r="{radius}" fill="#EEEEEE"/>')
+    angle = 90.0
+    for (label, size), color in zip(blood_data.items(), CHART_COLORS):
+        if not size:
+            continue
+        sweep = 360.0 * size / total
+        if sweep >= 360.0:
+            body.append(f'<circle cx="{cx}" cy="{cy}" r="{radius}" fill="{color}" stroke="white"/>')
+        else:
+            x1, y1 = _point(cx, cy, radius, angle)
+            x2, y2 = _point(cx, cy, radius, angle + sweep)
+            large_arc = 1 if sweep > 180 else 0
+            body.append(
+                f'<path d="M{cx},{cy} L{x1:.2f},{y1:.2f} A{radius},{radius} 0 {large_arc},0 {x2:.2f},{y2:.2f} Z" '
+                f'fill="{color}" stroke="white" stroke-width="1"/>'
+            )
+        lx, ly = _point(cx, cy, radius * 1.1, angle + sweep / 2)
+        anchor = 'start' if lx > cx + 1 else 'end' if lx < cx - 1 else 'middle'
+        body.append(
+            f'<text x="{lx:.2f}" y="{ly + 4:.2f}" text-anchor="{anchor}" font-size="12" '
+            f'font-weight="bold">{escape(label)}</text>'
+        )
+        angle += sweep
+    body.extend(_svg_legend(480, 150, blood_data))
+    return _svg_document(660, 480, body)
+
+
+def _render_bar_svg(blood_data):
+    left, top, plot_height, slot = 50, 20, 320, 50
+    peak = max(blood_data.values()) or 1
+    body = [f'<line x1="{left}" y1="{top + plot_height}" x2="{left + slot * len(blood_data)}" '
+            f'y2="{top + plot_height}" stroke="#555555"/>']
+    for i, ((label, size), color) in enumerate(zip(blood_data.items(), CHART_COLORS)):
+        height = plot_height * size / peak
+        x = left + i * slot + 8
+        body.append(f'<rect x="{x}" y="{top + plot_height - height:.2f}" width="{slot - 16}" '
+                    f'height="{height:.2f}" fill="{color}"/>')
+        body.append(f'<text x="{x + (slot - 16) / 2}" y="{top + plot_height + 18}" text-anchor="middle" '
+                    f'font-size="12" font-weight="bold">{escape(label)}</text>')
+    body.extend(_svg_legend(left + slot * len(blood_data) + 30, top + 60, blood_data))
+    return _svg_document(left + slot * len(blood_data) + 200, top + plot_height + 40, body)
+
+
+def render_stock_png(blood_data):
+    """Export-quality PNG through matplotlib, which is only imported on first use."""
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Patch
+
+    labels = list(blood_data.keys())
+    sizes = list(blood_data.values())
+    colors = CHART_COLORS[:len(labels)]
+
+    fig = Figure(figsize=(7,6), facecolor='white')
+    ax = fig.subplots()
+
+    if sum(sizes):
+        ax.pie(
+            sizes,
+            colors=colors,
+            startangle=90,
+            shadow=False,
+            wedgeprops={'edgecolor':'white', 'linewidth':1},
+            labels=labels,
+            labeldistance=1.1,
+            autopct=None,
+            textprops={'fontsize':12, 'weight':'bold'}
+        )
+    else:
+        # pie() rejects all-zero sizes; draw the same empty grey disc as the SVG.
+        ax.pie([1], colors=['#EEEEEE'], startangle=90)
+
+    ax.axis('equal')
+
+    legend_labels = [f"{label} : {size} ml" for label, size in zip(labels, sizes)]
+    ax.legend(
+        [Patch(facecolor=color) for color in colors],
+        legend_labels,
+        title="Blood Stock",
+        loc="center left",
+        bbox_to_anchor=(1, 0, 0.4, 1),
+        fontsize=12,
+        title_fontsize=13
+    )
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight', transparent=True)
+    return buf.getvalue()
+
+
+RENDERERS = {
+    'svg': lambda blood_data: render_stock_svg(blood_data).encode('utf-8'),
+    'png': render_stock_png,
+}
+
+
+def get_stock_chart(version=None, fmt='svg'):
+    """Bytes of the stock chart in ``fmt``, rendered at most once per stock version."""
+    if version is None:
+        version = get_stock_version()
+    key = f'blood_stock:chart:{fmt}:{version}'
+    chart = cache.get(key)
+    if chart is not None:
+        return chart
+    with _render_lock:
+        chart = cache.get(key)
+        if chart is None:
+            chart = RENDERERS[fmt](stock_totals())
+            cache.set(key, chart, CHART_CACHE_TIMEOUT)
+    return chart
@@ -0,0 +1,63 @@
+from .models import BLOOD_GROUP_CHOICES
+
+GROUPS = [group for group, _ in BLOOD_GROUP_CHOICES]
+BIT = {group: 1 << index for index, group in enumerate(GROUPS)}
+
+
+def _compatible(donor, recipient):
+    abo = donor[:-1] == 'O' or donor[:-1] in recipient[:-1]
+    rh = donor[-1] == '-' or recipient[-1] == '+'
+    return abo and rh
+
+
+def _mask(groups):
+    mask = 0
+    for group in groups:
+        mask |= BIT[group]
+    return mask
+
+
+# ABO/Rh red cell compatibility, precomputed as bitmasks over BLOOD_GROUP_CHOICES.
+# RECEIVES_FROM[recipient] has the bit of every donor group it can be given;
+# DONATES_TO[donor] has the bit of every recipient group it can serve.
+RECEIVES_FROM = {r: _mask(d for d in GROUPS if _compatible(d, r)) for r in GROUPS}
+DONATES_TO = {d: _mask(r for r in GROUPS if _compatible(d, r)) for d in GROUPS}
+
+
+def can_receive(recipient, donor):
+    return bool(RECEIVES_FROM.get(recipient, 0) & BIT.get(donor, 0))
+
+
+# Donor groups to draw from for each recipient: the exact group first, then the
+# substitutes that can serve the fewest other groups, so O- is used last.
+PREFERENCE = {
+    r: sorted(
+        (d for d in GROUPS if can_receive(r, d)),
+        key=lambda d: (d != r, bin(DONATES_TO[d]).count('1'), GROUPS.index(d)),
+    )
+    for r in GROUPS
+}
+
+
+def draw(recipient, units, balances):
+    """How to cover ``units`` for ``recipient`` from ``{blood_group: units}``, as
+    ``{blood_group: units}`` in preference order, or ``None`` if compatible stock is short.
+    """
+    draws, needed = {}, units
+    for donor in PREFERENCE.get(recipient, ()):
+        if not needed:
+            break
+        take = min(balances.get(donor, 0), needed)
+        if take > 0:
+            draws[donor] = take
+            needed -= take
+    return None if needed else draws
+
+
+def fulfillment(recipient, units, balances):
+    """``'exact'``, ``'substitution'`` or ``None``: how ``units`` could be served now."""
+    if balances.get(recipient, 0) >= units:
+        return 'exact'
+    if draw(recipient, units, balances) is not None:
+        return 'substitution'
+    return None
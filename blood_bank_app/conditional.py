@@ -0,0 +1,48 @@
+from django.db.models import Count, Max
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import get_stock_version
+
+# Without this browsers apply heuristic freshness to Last-Modified pages and skip
+# the revalidation the validators are there for.
+revalidate = cache_control(private=True, no_cache=True)
+
+
+def _stock_etag(request, *args, **kwargs):
+    # The page also shows the user's name, so two users never share an ETag.
+    return f'"stock-{get_stock_version()}-{request.user.pk}"'
+
+
+def stock_condition(view):
+    """Conditional GET for pages that only depend on the stock version."""
+    return revalidate(condition(etag_func=_stock_etag)(view))
+
+
+def history_condition(model):
+    """Conditional GET for a list of ``model`` rows owned by ``request.user``.
+
+    One indexed aggregate over (user, updated_at) yields both validators: the
+    newest ``updated_at`` is the Last-Modified date, and the row count in the
+    ETag catches deletions of older rows that would leave it unchanged.
+    """
+
+    def state(request):
+        if not hasattr(request, '_history_state'):
+            request._history_state = model.objects.filter(user=request.user).aggregate(
+                rows=Count('pk'), latest=Max('updated_at')
+            )
+        return request._history_state
+
+    def etag(request, *args, **kwargs):
+        current = state(request)
+        stamp = current['latest'].timestamp() if current['latest'] else 0
+        return f'"{model._meta.model_name}-{request.user.pk}-{current["rows"]}-{stamp}"'
+
+    def last_modified(request, *args, **kwargs):
+        return state(request)['latest']
+
+    def decorator(view):
+        return revalidate(condition(etag_func=etag, last_modified_func=last_modified)(view))
+
+    return decorator
@@ -0,0 +1,136 @@
+import operator
+from collections import Counter
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+
+from .models import BloodRequest, DonorForm, StatusCounter
+
+DONOR_FORM = 'donor_form'
+BLOOD_REQUEST = 'blood_request'
+
+GLOBAL_SCOPE = 'global'
+
+UPDATE_CHUNK = 200
+
+
+def role_scope(role):
+    return f'role:{role}'
+
+
+def user_scope(user_id, role=None):
+    return f'user:{user_id}:{role}' if role else f'user:{user_id}'
+
+
+def _scopes(kind, user_id, role):
+    if kind == DONOR_FORM:
+        scopes = [GLOBAL_SCOPE, role_scope('Donor')]
+        if user_id:
+            scopes.append(user_scope(user_id))
+    else:
+        scopes = [GLOBAL_SCOPE, role_scope(role)]
+        if user_id:
+            scopes.append(user_scope(user_id, role))
+    return scopes
+
+
+def _apply(deltas):
+    """Add ``{(kind, scope, status): delta}`` to the counters: one INSERT that creates any
+    missing rows, then one conditional ``count = count + CASE ...`` UPDATE per chunk.
+    """
+    deltas = [(key, delta) for key, delta in deltas.items() if delta]
+    if not deltas:
+        return
+    StatusCounter.objects.bulk_create(
+        [StatusCounter(kind=kind, scope=scope, status=status) for (kind, scope, status), _ in deltas],
+        ignore_conflicts=True,
+    )
+    for start in range(0, len(deltas), UPDATE_CHUNK):
+        chunk = deltas[start:start + UPDATE_CHUNK]
+        rows = [Q(kind=kind, scope=scope, status=status) for (kind, scope, status), _ in chunk]
+        StatusCounter.objects.filter(reduce(operator.or_, rows)).update(count=F('count') + Case(
+            *[When(row, then=Value(delta)) for row, (_, delta) in zip(rows, chunk)],
+            default=Value(0),
+        ))
+
+
+def record_many(kind, moves):
+    """Apply many ``(user_id, role, old_status, new_status, n)`` moves in a couple of queries.
+
+    Same semantics as ``record``; the deltas are summed per counter first, so moving
+    500 rows costs no more than moving one.
+    """
+    deltas = Counter()
+    for user_id, role, old_status, new_status, n in moves:
+        if old_status == new_status or not n:
+            continue
+        for scope in _scopes(kind, user_id, role):
+            if old_status:
+                deltas[kind, scope, old_status] -= n
+            if new_status:
+                deltas[kind, scope, new_status] += n
+    _apply(deltas)
+
+
+def record(kind, user_id, role, old_status, new_status, n=1):
+    """Move ``n`` rows from ``old_status`` to ``new_status`` in every scope they count towards.
+
+    Pass ``old_status=None`` for inserts and ``new_status=None`` for deletes. Call this
+    inside the transaction that writes the rows so the counters cannot drift.
+    """
+    record_many(kind, [(user_id, role, old_status, new_status, n)])
+
+
+def donor_form_changed(donor, old_status):
+    record(DONOR_FORM, donor.user_id, None, old_status, donor.status)
+
+
+def blood_request_changed(req, old_status):
+    record(BLOOD_REQUEST, req.user_id, req.role, old_status, req.status)
+
+
+def donor_forms_deleted(queryset):
+    """Release the counters for the rows in ``queryset`` before it is deleted."""
+    grouped = queryset.values('user_id', 'status').annotate(n=Count('pk'))
+    record_many(DONOR_FORM, [(row['user_id'], None, row['status'], None, row['n']) for row in grouped])
+
+
+def read_counts(kind, *scopes):
+    """Per-status counts plus ``total`` summed over ``scopes``; one indexed lookup."""
+    counts = {'total': 0}
+    rows = StatusCounter.objects.filter(kind=kind, scope__in=scopes).values_list('status', 'count')
+    for status, count in rows:
+        counts[status] = counts.get(status, 0) + count
+        counts['total'] += count
+    return counts
+
+
+def compute_counter_rows(donor_forms, blood_requests):
+    """Counter values derived from the source tables, as ``{(kind, scope, status): count}``."""
+    totals = Counter()
+    for row in donor_forms.values('user_id', 'status').annotate(n=Count('pk')):
+        for scope in _scopes(DONOR_FORM, row['user_id'], None):
+            totals[DONOR_FORM, scope, row['status']] += row['n']
+    for row in blood_requests.values('user_id', 'role', 'status').annotate(n=Count('pk')):
+        for scope in _scopes(BLOOD_REQUEST, row['user_id'], row['role']):
+            totals[BLOOD_REQUEST, scope, row['status']] += row['n']
+    return totals
+
+
+def rebuild_counters():
+    """Recompute every counter from DonorForm and BloodRequest. Returns rows that had drifted."""
+    with transaction.atomic():
+        expected = compute_counter_rows(DonorForm.objects.all(), BloodRequest.objects.all())
+        current = {
+            (c.kind, c.scope, c.status): c.count for c in StatusCounter.objects.select_for_update()
+        }
+        drifted = {
+            key for key in expected.keys() | current.keys() if expected.get(key, 0) != current.get(key, 0)
+        }
+        StatusCounter.objects.all().delete()
+        StatusCounter.objects.bulk_create(
+            StatusCounter(kind=kind, scope=scope, status=status, count=count)
+            for (kind, scope, status), count in expected.items()
+        )
+    return drifted
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import threading
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+
+from .models import DonorForm, get_stock_version
+from .snapshot import stock_totals
+
+EVENTS_PATH = '/events/'
+STOCK_CHANNEL = 'stock'
+KEEPALIVE_SECONDS = 15
+# Writes in other worker processes only reach this one through the stock version.
+STOCK_POLL_SECONDS = 2
+QUEUE_SIZE = 100
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """One client's mailbox. Lives on the event loop that serves the client."""
+
+    def __init__(self, channels):
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        if self.queue.full():
+            # A client this far behind reconnects and starts from a fresh snapshot.
+            self.overflowed = True
+        else:
+            self.queue.put_nowait(event)
+
+
+class Broker:
+    """In-process pub/sub. Publishing is thread-safe and never blocks: events are
+    handed to each subscriber's event loop, where an idle client costs a queue
+    and a suspended coroutine, not a thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def has_subscribers(self, channel):
+        return channel in self._subscribers
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+
+broker = Broker()
+
+_stock_lock = threading.Lock()
+_stock_state = {'version': None, 'totals': {}}
+
+
+def publish_stock_changes():
+    """Publish the groups whose totals moved since the last stock event, if anyone
+    listens. Returns the current ``(version, totals)``.
+    """
+    if not broker.has_subscribers(STOCK_CHANNEL):
+        return None
+    with _stock_lock:
+        version = get_stock_version()
+        if version == _stock_state['version']:
+            return version, _stock_state['totals']
+        totals = stock_totals()
+        # Nothing to diff against before the first snapshot: the caller sends it whole.
+        changes = _stock_state['version'] is not None and {
+            group: units for group, units in totals.items() if _stock_state['totals'].get(group) != units
+        }
+        _stock_state.update(version=version, totals=totals)
+    if changes:
+        # Totals are absolute, so a client that also got them in its first snapshot loses nothing.
+        broker.publish(STOCK_CHANNEL, ('stock', {'version': version, 'changes': changes}))
+    return version, totals
+
+
+def stock_changed():
+    """Call inside the writing transaction; publishes once it commits."""
+    transaction.on_commit(publish_stock_changes)
+
+
+def rows_changed(rows):
+    """Tell the owners of these DonorForm/BloodRequest rows about their new status, on commit."""
+    events = [
+        (user_channel(row.user_id), ('status', {
+            'kind': 'donor_form' if isinstance(row, DonorForm) else 'blood_request',
+            'id': row.pk,
+            'status': row.status,
+            'message': getattr(row, 'admin_message', None) or '',
+        }))
+        for row in rows if row.user_id
+    ]
+    if events:
+        transaction.on_commit(lambda: [broker.publish(channel, event) for channel, event in events])
+
+
+def event_stream(request):
+    """Context processor: ``event_stream_url`` is set only when the page is served by
+    the ASGI application, the one that routes EVENTS_PATH to the stream. Under WSGI
+    it is None and templates leave the EventSource script out.
+    """
+    return {'event_stream_url': EVENTS_PATH if isinstance(request, ASGIRequest) else None}
+
+
+def _encode(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+def _authenticate(scope):
+    cookies = SimpleCookie()
+    for name, value in scope.get('headers', ()):
+        if name == b'cookie':
+            cookies.load(value.decode('latin-1'))
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    store = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value if morsel else None)
+    return get_user(SimpleNamespace(session=store))
+
+
+_poller = None
+
+
+async def _poll_stock():
+    global _poller
+    try:
+        while broker.has_subscribers(STOCK_CHANNEL):
+            await sync_to_async(publish_stock_changes)()
+            await asyncio.sleep(STOCK_POLL_SECONDS)
+    finally:
+        _poller = None
+
+
+async def sse_application(scope, receive, send):
+    """ASGI app streaming ``stock`` and the user's ``status`` events as server-sent events."""
+    global _poller
+    user = await sync_to_async(_authenticate)(scope)
+    if not user.is_authenticated:
+        await send({'type': 'http.response.start', 'status': 403, 'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'Login required.'})
+        return
+
+    subscription = broker.subscribe([STOCK_CHANNEL, user_channel(user.pk)])
+    if _poller is None:
+        _poller = asyncio.ensure_future(_poll_stock())
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        version, totals = await sync_to_async(publish_stock_changes)()
+        await send({'type': 'http.response.body', 'body': _encode('stock', {'version': version, 'changes': totals}),
+                    'more_body': True})
+        while not subscription.overflowed:
+            next_event = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected}, timeout=KEEPALIVE_SECONDS, return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected in done:
+                next_event.cancel()
+                return
+            if next_event in done:
+                body = _encode(*next_event.result())
+            else:
+                next_event.cancel()
+                body = b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        broker.unsubscribe(subscription)
+        disconnected.cancel()
+        if _poller is not None and not broker.has_subscribers(STOCK_CHANNEL):
+            _poller.cancel()
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, CharField, Value, When
+
+from .inventory import balances_changed
+from .models import BloodLot, ExpiredStock, SharedVersion
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+NEAR_EXPIRY_DAYS = 5
+# SharedVersion row holding the time (in seconds) of the last in-process sweep.
+SWEEP_LEASE = 'expiry_sweep'
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def with_expiry_state(queryset, today=None):
+    """Annotate ``expiry_state`` ('expired', 'near' or 'valid') in SQL."""
+    today = today or date.today()
+    return queryset.annotate(expiry_state=Case(
+        When(expiry_date__lt=today, then=Value('expired')),
+        When(expiry_date__lte=today + timedelta(days=NEAR_EXPIRY_DAYS), then=Value('near')),
+        default=Value('valid'),
+        output_field=CharField(),
+    ))
+
+
+def sweep_expired_stock(batch_size=BATCH_SIZE, today=None):
+    """Retire lots past their expiry date into ExpiredStock, ``batch_size`` lots per
+    transaction so no single write holds the database lock for long.
+    Returns the number of lots retired.
+    """
+    today = today or date.today()
+    removed = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                BloodLot.objects.select_for_update()
+                .filter(remaining__gt=0, expiry_date__lt=today)
+                .order_by('expiry_date')[:batch_size]
+            )
+            if not batch:
+                break
+            ExpiredStock.objects.bulk_create(
+                ExpiredStock(
+                    blood_group=lot.blood_group,
+                    units=lot.remaining,
+                    collected_date=lot.collected_date,
+                    expiry_date=lot.expiry_date,
+                )
+                for lot in batch
+            )
+            BloodLot.objects.filter(pk__in=[lot.pk for lot in batch]).update(remaining=0)
+            balances_changed(lot.blood_group for lot in batch)
+        removed += len(batch)
+        for lot in batch:
+            logger.info("Retired expired %s lot %s (%s units, expired %s)", lot.blood_group, lot.pk, lot.remaining, lot.expiry_date)
+    return removed
+
+
+def claim_sweep(interval, now=None):
+    """Claim the sweep due this ``interval`` for the calling process.
+
+    Every worker that boots the app runs a sweeper thread, but only the one whose
+    conditional UPDATE moves the lease forward sweeps; the rest find the lease taken
+    and wait for the next interval. Returns True when the caller won.
+    """
+    now = int(time.time() if now is None else now)
+    SharedVersion.objects.bulk_create([SharedVersion(name=SWEEP_LEASE, value=0)], ignore_conflicts=True)
+    return bool(SharedVersion.objects.filter(pk=SWEEP_LEASE, value__lte=now - interval).update(value=now))
+
+
+def start_expiry_sweeper(interval=None):
+    """Run the sweeper every ``interval`` seconds (default EXPIRY_SWEEP_INTERVAL) in a
+    daemon thread. Safe to call more than once; a falsy interval disables it.
+
+    Each process gets its own thread, and ``claim_sweep`` lets one of them sweep per
+    interval across every worker sharing the database.
+    """
+    global _sweeper
+    interval = settings.EXPIRY_SWEEP_INTERVAL if interval is None else interval
+    if not interval:
+        return None
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_run_sweeper, args=(interval,), name='expiry-sweeper', daemon=True)
+            _sweeper.start()
+    return _sweeper
+
+
+def _run_sweeper(interval):
+    while True:
+        try:
+            if claim_sweep(interval):
+                sweep_expired_stock()
+        except Exception:
+            logger.exception("Expiry sweep failed")
+        finally:
+            # Connections are per thread; don't keep one open between sweeps.
+            connections.close_all()
+        time.sleep(interval)
@@ -9,7 +9,8 @@ User = get_user_model()
 
 class UserRegistrationForm(forms.ModelForm):
     role = forms.ChoiceField(
-        choices=Credential.ROLE_CHOICES,
+        # Admin rights come from is_superuser, never from a self-chosen role.
+        choices=[choice for choice in Credential.ROLE_CHOICES if choice[0] != 'admin'],
         widget=forms.RadioSelect(attrs={'class': 'role-choice'})
     )
     password1 = forms.CharField(
@@ -44,9 +45,13 @@ class UserRegistrationForm(forms.ModelForm):
             raise forms.ValidationError("Passwords do not match.")
         return cleaned_data
 
-    def save(self, commit=True):
+    def save(self, commit=True, encoded_password=None):
+        """``encoded_password``, if given, is ``password1`` already hashed."""
         user = super().save(commit=False)
-        user.set_password(self.cleaned_data['password1'])
+        if encoded_password:
+            user.password = encoded_password
+        else:
+            user.set_password(self.cleaned_data['password1'])
         if commit:
             user.save()
         return user
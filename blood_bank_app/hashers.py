@@ -0,0 +1,69 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hash_pool():
+    """Process-wide pool of ``PASSWORD_HASH_WORKERS`` threads (one per core by default)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+                _pool = ThreadPoolExecutor(workers, thread_name_prefix='password-hash')
+    return _pool
+
+
+async def run_hashing(func, *args):
+    """Await ``func(*args)`` on the hash pool: the event loop keeps serving other
+    requests meanwhile, and a login spike runs at most ``PASSWORD_HASH_WORKERS``
+    hashes at once instead of one per request thread.
+    """
+    return await asyncio.get_running_loop().run_in_executor(hash_pool(), func, *args)
+
+
+async def amake_password(password):
+    return await run_hashing(hashers.make_password, password)
+
+
+async def acheck_password(user, password):
+    """``user.check_password(password)`` with the hashing on the pool; a password the
+    hasher wants upgraded is rehashed there too and saved. ``user`` may be None, in
+    which case a dummy hash still runs so unknown usernames take as long as wrong
+    passwords.
+    """
+    if user is None:
+        await amake_password(password)
+        return False
+    is_correct, must_update = await run_hashing(hashers.verify_password, password, user.password)
+    if is_correct and must_update:
+        user.password = await amake_password(password)
+        await user.asave(update_fields=['password'])
+    return is_correct
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """Django's PBKDF2-SHA256 with the iteration count taken from settings.
+
+    The algorithm name is unchanged, so existing hashes verify. ``must_update`` only
+    asks for a rehash when the configured count is higher than the stored one:
+    lowering the setting speeds up new hashes but never weakens stored ones.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS or hashers.PBKDF2PasswordHasher.iterations
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return (
+            decoded['iterations'] < self.iterations
+            or hashers.must_update_salt(decoded['salt'], self.salt_entropy)
+        )
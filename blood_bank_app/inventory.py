@@ -0,0 +1,154 @@
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from . import events
+from .models import SHELF_LIFE_DAYS, BloodLot, BloodStock, bump_stock_version
+
+
+class InsufficientStock(Exception):
+    def __init__(self, blood_group, requested, available):
+        super().__init__(f"Not enough {blood_group}: requested {requested}, available {available}.")
+        self.blood_group = blood_group
+        self.requested = requested
+        self.available = available
+
+
+def live_lots(blood_group, today=None):
+    """Unexpired lots of ``blood_group`` that still hold units, in FEFO order."""
+    today = today or date.today()
+    return BloodLot.objects.filter(
+        blood_group=blood_group, remaining__gt=0, expiry_date__gte=today
+    ).order_by('expiry_date', 'id')
+
+
+def refresh_balances(blood_groups, today=None):
+    """Recompute the cached BloodStock balance and dates of ``blood_groups`` from their
+    live lots, in one UPDATE, and bump the stock version.
+    """
+    today = today or date.today()
+    blood_groups = sorted(set(blood_groups))
+    lots = BloodLot.objects.filter(blood_group=OuterRef('blood_group'), remaining__gt=0, expiry_date__gte=today)
+    with transaction.atomic():
+        for blood_group in blood_groups:
+            BloodStock.objects.get_or_create(blood_group=blood_group)
+        BloodStock.objects.filter(blood_group__in=blood_groups).update(
+            units=Coalesce(Subquery(lots.values('blood_group').annotate(total=Sum('remaining')).values('total')), 0),
+            collected_date=Coalesce(
+                Subquery(lots.order_by('-collected_date').values('collected_date')[:1]), F('collected_date')
+            ),
+            expiry_date=Subquery(lots.order_by('expiry_date').values('expiry_date')[:1]),
+        )
+        transaction.on_commit(bump_stock_version)
+        events.stock_changed()
+
+
+def balances_changed(blood_groups):
+    """Refresh the balances of ``blood_groups`` once the writing transaction commits.
+
+    Writers only touch lot rows; the per-group row is rewritten afterwards in its own
+    short transaction, so receipts and allocations of one group never wait on it.
+    """
+    blood_groups = set(blood_groups)
+    if blood_groups:
+        transaction.on_commit(lambda: refresh_balances(blood_groups))
+
+
+@transaction.atomic
+def receive(blood_group, units, donor=None, collected_date=None):
+    """Add a new lot to stock. Inserts never contend with allocations of older lots."""
+    collected_date = collected_date or date.today()
+    lot = BloodLot.objects.create(
+        blood_group=blood_group,
+        units=units,
+        remaining=units,
+        collected_date=collected_date,
+        expiry_date=collected_date + timedelta(days=SHELF_LIFE_DAYS),
+        donor=donor,
+    )
+    balances_changed([blood_group])
+    return lot
+
+
+@transaction.atomic
+def receive_many(donations, collected_date=None):
+    """Add one lot per ``(blood_group, units, donor)`` in a single INSERT, then refresh
+    the balances of the groups they touched once, rather than per lot.
+    """
+    collected_date = collected_date or date.today()
+    lots = BloodLot.objects.bulk_create(
+        BloodLot(
+            blood_group=blood_group,
+            units=units,
+            remaining=units,
+            collected_date=collected_date,
+            expiry_date=collected_date + timedelta(days=SHELF_LIFE_DAYS),
+            donor=donor,
+        )
+        for blood_group, units, donor in donations
+    )
+    balances_changed(lot.blood_group for lot in lots)
+    return lots
+
+
+@transaction.atomic
+def allocate(blood_group, units):
+    """Take ``units`` from the lots that expire first. Returns ``[(lot, taken), ...]``
+    or raises InsufficientStock without changing anything.
+
+    Every write is a conditional ``UPDATE ... SET n = n - k WHERE n >= k`` on one lot,
+    so concurrent allocations can neither lose an update nor overdraw a lot, and no
+    row is read and rewritten from Python.
+    """
+    available = available_units(blood_group)
+    if available < units:
+        raise InsufficientStock(blood_group, units, available)
+
+    needed = units
+    taken = []
+    while needed:
+        lot = live_lots(blood_group).first()
+        if lot is None:
+            # Another allocation took the units since they were counted; the
+            # transaction rolls back what this one had already taken.
+            raise InsufficientStock(blood_group, units, units - needed)
+        portion = min(lot.remaining, needed)
+        if BloodLot.objects.filter(pk=lot.pk, remaining__gte=portion).update(remaining=F('remaining') - portion):
+            lot.remaining -= portion
+            taken.append((lot, portion))
+            needed -= portion
+    balances_changed([blood_group])
+    return taken
+
+
+@transaction.atomic
+def set_balance(blood_group, units):
+    """Bring a group to exactly ``units`` by receiving or allocating the difference."""
+    current = available_units(blood_group)
+    if units > current:
+        receive(blood_group, units - current)
+    elif units < current:
+        allocate(blood_group, current - units)
+
+
+@transaction.atomic
+def discard_group(blood_group):
+    """Empty every lot of ``blood_group`` and remove its balance row."""
+    BloodLot.objects.filter(blood_group=blood_group, remaining__gt=0).update(remaining=0)
+    for stock in BloodStock.objects.filter(blood_group=blood_group):
+        stock.delete()
+
+
+def live_balances(blood_groups=None, today=None):
+    """``{blood_group: units}`` over the unexpired lots, in one grouped query."""
+    today = today or date.today()
+    lots = BloodLot.objects.filter(remaining__gt=0, expiry_date__gte=today)
+    if blood_groups is not None:
+        lots = lots.filter(blood_group__in=blood_groups)
+    return dict(lots.values('blood_group').annotate(total=Sum('remaining')).values_list('blood_group', 'total'))
+
+
+def available_units(blood_group):
+    return live_lots(blood_group).aggregate(total=Sum('remaining'))['total'] or 0
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from blood_bank_app.models import Credential
+
+ROLES = ['Donor', 'Patient', 'Hospital']
+PASSWORD = 'bench-password'
+USER_PREFIX = 'bench-login-'
+
+# MD5 costs microseconds, so comparing against it isolates the hasher's share.
+NO_HASHING = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+class Command(BaseCommand):
+    help = (
+        "Logins per second through the login view at each PBKDF2 iteration count, from "
+        "concurrent clients, plus a run with hashing made free to separate hasher cost."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=3.0, help="Duration of each run.")
+        parser.add_argument('--users', type=int, default=3, help="Bench users per role.")
+        parser.add_argument(
+            '--threads', type=int, default=os.cpu_count() or 1, help="Concurrent clients logging in.",
+        )
+        parser.add_argument(
+            '--iterations', type=int, nargs='*', default=[],
+            help="PBKDF2 iteration counts to compare (default: only the configured one).",
+        )
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        cores = min(threads, os.cpu_count() or 1)
+        levels = [(f'{count:,} iterations', {'PASSWORD_HASH_ITERATIONS': count}) for count in options['iterations']]
+        levels = levels or [('configured hasher', {})]
+        levels.append(('hashing removed', {'PASSWORD_HASHERS': NO_HASHING}))
+
+        self._clients = []
+        setup_test_environment()
+        try:
+            # Committed, so the client threads' own connections can see them; the
+            # users and the sessions their logins leave behind are deleted below.
+            users = self._users(options['users'])
+            self.stdout.write(f"{threads} client threads, {cores} cores in use")
+            self.stdout.write(
+                f"{'tuning':<22} {'logins/s':>10} {'per core':>10} {'ms/login':>10} {'queries':>8}"
+            )
+            for label, overrides in levels:
+                with override_settings(**overrides):
+                    queries = self._prepare(users)
+                    logins, elapsed = self._load(users, threads, options['seconds'])
+                rate = logins / elapsed
+                self.stdout.write(
+                    f"{label:<22} {rate:>10.1f} {rate / cores:>10.1f} "
+                    f"{elapsed * threads / max(logins, 1) * 1000:>10.1f} {queries:>8}"
+                )
+        finally:
+            for client in self._clients:
+                # Each login replaces the client's previous session, so its last one is all that is left.
+                client.session.delete()
+            User.objects.filter(username__startswith=USER_PREFIX).delete()
+            teardown_test_environment()
+
+    def _users(self, per_role):
+        User.objects.filter(username__startswith=USER_PREFIX).delete()
+        users = []
+        with transaction.atomic():
+            for role in ROLES:
+                for index in range(per_role):
+                    user = User.objects.create_user(f'{USER_PREFIX}{role.lower()}-{index}')
+                    Credential.objects.create(user=user, role=role)
+                    users.append((user.username, role))
+        return users
+
+    def _prepare(self, users):
+        """Hash the bench password with the current tuning, then count one login's queries."""
+        for user in User.objects.filter(username__startswith=USER_PREFIX):
+            user.set_password(PASSWORD)
+            user.save(update_fields=['password'])
+
+        # Counted with a wrapper: the request_started signal clears connection.queries.
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            _log_in(self._client(), *users[0])
+        return len(queries)
+
+    def _load(self, users, threads, seconds):
+        counts = [0] * threads
+        deadline = time.perf_counter() + seconds
+
+        def client(index):
+            session = self._client()
+            try:
+                while time.perf_counter() < deadline:
+                    _log_in(session, *users[(index + counts[index] * threads) % len(users)])
+                    counts[index] += 1
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=client, args=(index,)) for index in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return sum(counts), time.perf_counter() - start
+
+    def _client(self):
+        client = Client()
+        self._clients.append(client)
+        return client
+
+
+def _log_in(client, username, role):
+    response = client.post(reverse('login'), {'username': username, 'password': PASSWORD, 'role': role})
+    assert response.status_code == 302, response.status_code
@@ -0,0 +1,67 @@
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+HEAVY_MODULES = ['matplotlib', 'numpy', 'PIL']
+
+BOOT_SCRIPT = (
+    "import django; django.setup(); "
+    "import blood_bank.urls, blood_bank_app.views; "
+    "import sys; print(' '.join(sorted(m for m in sys.modules if '.' not in m)))"
+)
+
+
+class Command(BaseCommand):
+    help = "Report import-time cost of booting the app and wall time of `manage.py check`."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Runs of `manage.py check` to time.")
+        parser.add_argument('--top', type=int, default=15, help="Slowest imports to list.")
+        parser.add_argument(
+            '--forbid', nargs='*', default=HEAVY_MODULES,
+            help="Top-level modules that must not be imported at boot (fails the command).",
+        )
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+
+        imports = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+            imports.append((int(cumulative_us), int(self_us), name[1:].rstrip()))
+        top_level = [row for row in imports if not row[2].startswith(' ')]
+        total_us = sum(row[0] for row in top_level)
+
+        self.stdout.write(f"Boot imports: {len(imports)} modules, {total_us / 1000:.1f} ms cumulative")
+        for cumulative_us, self_us, name in sorted(imports, reverse=True)[:options['top']]:
+            self.stdout.write(f"  {cumulative_us / 1000:9.1f} ms  (self {self_us / 1000:7.1f} ms)  {name.strip()}")
+
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, 'manage.py', 'check'],
+                cwd=settings.BASE_DIR, capture_output=True, check=True,
+            )
+            timings.append(time.perf_counter() - start)
+        self.stdout.write(
+            f"manage.py check: median {statistics.median(timings) * 1000:.0f} ms, "
+            f"min {min(timings) * 1000:.0f} ms over {len(timings)} runs"
+        )
+
+        loaded = set(result.stdout.split())
+        offenders = sorted(loaded.intersection(options['forbid']))
+        if offenders:
+            raise CommandError(f"Heavy modules imported at boot: {', '.join(offenders)}")
+        self.stdout.write(self.style.SUCCESS("No heavy modules imported at boot."))
@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from blood_bank_app import sharedstock
+from blood_bank_app.models import BloodStock
+from blood_bank_app.snapshot import stock_snapshot
+
+
+def _read_db(name):
+    return list(BloodStock.objects.values_list('blood_group', 'units'))
+
+
+def _read_cache(name):
+    return stock_snapshot()
+
+
+def _read_shm(name):
+    return sharedstock.attach(name).read()
+
+
+READERS = {'db': _read_db, 'cache': _read_cache, 'shm': _read_shm}
+
+
+def _worker(args):
+    mode, seconds, name = args
+    read = READERS[mode]
+    read(name)
+    reads = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            read(name)
+        reads += 100
+    return reads
+
+
+class Command(BaseCommand):
+    help = "Compare stock reads from the database, the Django cache and shared memory across worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Reader processes per mode.")
+        parser.add_argument('--seconds', type=float, default=2.0, help="Duration of each mode.")
+        parser.add_argument(
+            '--writes-per-second', type=int, default=100,
+            help="Rate at which the shared block is republished while the shm readers run.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            raise CommandError("This benchmark forks its workers and needs a platform that supports fork().")
+
+        workers, seconds = options['workers'], options['seconds']
+        name = f'blood_bank_bench_{os.getpid()}'
+        block = sharedstock.attach(name)
+        totals = dict(BloodStock.objects.values_list('blood_group', 'units'))
+        block.write(totals)
+        # Children must open their own database connections.
+        connections.close_all()
+
+        self.stdout.write(f"{workers} workers, {seconds:g}s per mode")
+        self.stdout.write(f"{'mode':<6} {'reads/s':>12} {'us/read':>9}")
+        try:
+            for mode in READERS:
+                stop = threading.Event()
+                writer = None
+                if mode == 'shm' and options['writes_per_second']:
+                    interval = 1 / options['writes_per_second']
+
+                    def republish():
+                        while not stop.wait(interval):
+                            block.write(totals)
+
+                    writer = threading.Thread(target=republish, daemon=True)
+                    writer.start()
+                with context.Pool(workers) as pool:
+                    reads = sum(pool.map(_worker, [(mode, seconds, name)] * workers))
+                stop.set()
+                if writer:
+                    writer.join()
+                rate = reads / seconds
+                self.stdout.write(f"{mode:<6} {rate:>12,.0f} {workers / rate * 1e6:>9.2f}")
+        finally:
+            block.close(unlink=True)
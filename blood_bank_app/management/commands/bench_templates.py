@@ -0,0 +1,119 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.template import Engine, RequestContext, engines
+from django.test import Client, override_settings
+from django.test.signals import template_rendered
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+PAGES = [
+    ('admin', 'dashboard'),
+    ('admin', 'admin_donors'),
+    ('admin', 'admin_donors_list'),
+    ('admin', 'admin_patients'),
+    ('admin', 'admin_hospitals'),
+    ('admin', 'blood_stock_list'),
+    ('admin', 'admin_blood_request'),
+    ('Patient', 'patienthome'),
+    ('Donor', 'donorhome'),
+    ('Hospital', 'hospitalhome'),
+]
+
+DIRECT_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+# (label, cached loader, fragment cache)
+MODES = [
+    ('direct', False, False),
+    ('cached', True, False),
+    ('fragments', True, True),
+]
+
+
+def _engine(cached):
+    configured = engines['django'].engine
+    return Engine(
+        dirs=configured.dirs,
+        loaders=[('django.template.loaders.cached.Loader', DIRECT_LOADERS)] if cached else DIRECT_LOADERS,
+        context_processors=configured.context_processors,
+        libraries=configured.libraries,
+    )
+
+
+def _user(role):
+    if role == 'admin':
+        return User.objects.filter(is_superuser=True).first()
+    return User.objects.filter(credential__role=role).first()
+
+
+class Command(BaseCommand):
+    help = (
+        "Per-page template render time with a direct loader, the cached loader, and the "
+        "cached loader plus {% cache %} fragments, using each page's real context."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200, help="Renders per page and mode.")
+
+    def _capture(self):
+        """``(url_name, template_name, request, context)`` for every page a user exists for."""
+        captured = []
+        setup_test_environment()
+        try:
+            for role, url_name in PAGES:
+                user = _user(role)
+                if user is None:
+                    self.stdout.write(f"skipping {url_name}: no {role} user")
+                    continue
+                client = Client()
+                client.force_login(user)
+                rendered = []
+
+                def record(sender, template, context, **kwargs):
+                    if not rendered:
+                        rendered.append((template.name, context.flatten()))
+
+                template_rendered.connect(record)
+                try:
+                    response = client.get(reverse(url_name))
+                finally:
+                    template_rendered.disconnect(record)
+                if response.status_code != 200 or not rendered:
+                    self.stdout.write(f"skipping {url_name}: HTTP {response.status_code}")
+                    continue
+                captured.append((url_name, rendered[0][0], response.wsgi_request, rendered[0][1]))
+        finally:
+            teardown_test_environment()
+        return captured
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        pages = self._capture()
+        no_fragments = {**settings.CACHES, 'template_fragments': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }}
+
+        self.stdout.write(f"{'page':<22}" + ''.join(f"{label + ' ms':>15}" for label, _, _ in MODES))
+        totals = [0.0] * len(MODES)
+        for url_name, template_name, request, context in pages:
+            row = []
+            for index, (_, cached, fragments) in enumerate(MODES):
+                engine = _engine(cached)
+                with override_settings(CACHES=settings.CACHES if fragments else no_fragments):
+                    caches['template_fragments'].clear()
+                    engine.get_template(template_name).render(RequestContext(request, context))
+                    start = time.perf_counter()
+                    for _ in range(repeat):
+                        engine.get_template(template_name).render(RequestContext(request, context))
+                    per_render = (time.perf_counter() - start) / repeat * 1000
+                totals[index] += per_render
+                row.append(per_render)
+            self.stdout.write(f"{url_name:<22}" + ''.join(f"{ms:>15.3f}" for ms in row))
+        if pages:
+            self.stdout.write(f"{'mean':<22}" + ''.join(f"{ms / len(pages):>15.3f}" for ms in totals))
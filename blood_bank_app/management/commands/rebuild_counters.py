@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from blood_bank_app.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized DonorForm/BloodRequest status counters from the source tables."
+
+    def handle(self, *args, **options):
+        drifted = rebuild_counters()
+        for kind, scope, status in sorted(drifted):
+            self.stdout.write(f"  corrected {kind} {scope} {status}")
+        self.stdout.write(self.style.SUCCESS(f"Counters rebuilt; {len(drifted)} had drifted."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blood_bank_app.expiry import BATCH_SIZE, sweep_expired_stock
+
+
+class Command(BaseCommand):
+    help = "Retire blood stock past its expiry date into the ExpiredStock log."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        removed = sweep_expired_stock(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Retired {removed} expired stock record(s)."))
@@ -0,0 +1,46 @@
+from .counters import BLOOD_REQUEST, DONOR_FORM, GLOBAL_SCOPE, read_counts, role_scope, user_scope
+from .snapshot import stock_totals
+
+REQUEST_ROLES = ['Patient', 'Hospital']
+
+
+def admin_dashboard_metrics():
+    donors = read_counts(DONOR_FORM, GLOBAL_SCOPE)
+    requests = read_counts(BLOOD_REQUEST, *[role_scope(role) for role in REQUEST_ROLES])
+    total_units = sum(stock_totals().values())
+    return {
+        'available_donors': donors['total'],
+        'total_blood_units': total_units,
+        'total_requests': requests['total'] + donors['total'],
+        'approved_requests': requests.get('Accepted', 0) + donors.get('Approved', 0),
+        'blood_stock': total_units,
+    }
+
+
+def donor_home_metrics(user):
+    donors = read_counts(DONOR_FORM, user_scope(user.pk))
+    return {
+        'total_requests': donors['total'],
+        'pending_requests': donors.get('Pending', 0),
+        'approved_requests': donors.get('Approved', 0),
+        'rejected_requests': donors.get('Rejected', 0),
+    }
+
+
+def patient_home_metrics(user):
+    requests = read_counts(BLOOD_REQUEST, *[user_scope(user.pk, role) for role in REQUEST_ROLES])
+    return {
+        'total_requests': requests['total'],
+        'pending_requests': requests.get('Pending', 0),
+        'approved_requests': requests.get('Accepted', 0),
+        'rejected_requests': requests.get('Rejected', 0),
+    }
+
+
+def hospital_home_metrics(user):
+    requests = read_counts(BLOOD_REQUEST, user_scope(user.pk, 'Hospital'))
+    return {
+        'total_requests': requests['total'],
+        'approved_requests': requests.get('Accepted', 0),
+        'available_donors': read_counts(DONOR_FORM, GLOBAL_SCOPE)['total'],
+    }
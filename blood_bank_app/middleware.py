@@ -0,0 +1,19 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import roles
+
+
+class RoleMiddleware:
+    """Expose the user's role and profile flag as ``request.role``.
+
+    They are resolved at most once per session and kept there, so role checks
+    cost no queries; views that never look at ``request.role`` do not even read
+    the session for it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.role = SimpleLazyObject(lambda: roles.current(request))
+        return self.get_response(request)
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:04
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    # The counter layout as of this migration, kept here so later changes to
+    # blood_bank_app.counters cannot change what this step writes.
+    DonorForm = apps.get_model('blood_bank_app', 'DonorForm')
+    BloodRequest = apps.get_model('blood_bank_app', 'BloodRequest')
+    StatusCounter = apps.get_model('blood_bank_app', 'StatusCounter')
+
+    rows = Counter()
+    for row in DonorForm.objects.values('user_id', 'status').annotate(n=Count('pk')):
+        scopes = ['global', 'role:Donor']
+        if row['user_id']:
+            scopes.append(f"user:{row['user_id']}")
+        for scope in scopes:
+            rows['donor_form', scope, row['status']] += row['n']
+    for row in BloodRequest.objects.values('user_id', 'role', 'status').annotate(n=Count('pk')):
+        scopes = ['global', f"role:{row['role']}"]
+        if row['user_id']:
+            scopes.append(f"user:{row['user_id']}:{row['role']}" if row['role'] else f"user:{row['user_id']}")
+        for scope in scopes:
+            rows['blood_request', scope, row['status']] += row['n']
+
+    StatusCounter.objects.bulk_create(
+        StatusCounter(kind=kind, scope=scope, status=status, count=count)
+        for (kind, scope, status), count in rows.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_bank_app', '0033_hospitaldetails_profile_picture_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('donor_form', 'Donor form'), ('blood_request', 'Blood request')], max_length=20)),
+                ('scope', models.CharField(max_length=50)),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'scope', 'status'), name='unique_status_counter')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
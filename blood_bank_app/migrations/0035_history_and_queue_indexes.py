@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_bank_app', '0034_statuscounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['user', '-created_at'], name='bloodreq_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['user', 'role', 'status', '-created_at'], name='bloodreq_user_role_status'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['role', 'status', '-created_at'], name='bloodreq_role_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='donorform',
+            index=models.Index(fields=['user', '-created_at'], name='donorform_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='donorform',
+            index=models.Index(fields=['status', '-created_at'], name='donorform_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='donorform',
+            index=models.Index(fields=['email'], name='donorform_email'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_bank_app', '0035_history_and_queue_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='donorform',
+            name='donorform_status_created',
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['-created_at', '-id'], name='bloodreq_created'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='bloodreq_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='credential',
+            index=models.Index(fields=['role'], name='credential_role'),
+        ),
+        migrations.AddIndex(
+            model_name='donorform',
+            index=models.Index(fields=['-created_at', '-id'], name='donorform_created'),
+        ),
+        migrations.AddIndex(
+            model_name='donorform',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='donorform_status_created'),
+        ),
+    ]
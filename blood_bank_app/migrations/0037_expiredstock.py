@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_bank_app', '0036_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiredStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=5)),
+                ('units', models.PositiveIntegerField()),
+                ('collected_date', models.DateField()),
+                ('expiry_date', models.DateField()),
+                ('retired_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bloodstock',
+            index=models.Index(fields=['expiry_date'], name='bloodstock_expiry'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:10
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def lots_from_balances(apps, schema_editor):
+    BloodStock = apps.get_model('blood_bank_app', 'BloodStock')
+    BloodLot = apps.get_model('blood_bank_app', 'BloodLot')
+    BloodLot.objects.bulk_create(
+        BloodLot(
+            blood_group=stock.blood_group,
+            units=stock.units,
+            remaining=stock.units,
+            collected_date=stock.collected_date,
+            expiry_date=stock.expiry_date or stock.collected_date + datetime.timedelta(days=35),
+        )
+        for stock in BloodStock.objects.filter(units__gt=0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_bank_app', '0037_expiredstock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloodLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=5)),
+                ('units', models.PositiveIntegerField()),
+                ('remaining', models.PositiveIntegerField()),
+                ('collected_date', models.DateField(default=datetime.date.today)),
+                ('expiry_date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('donor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lots', to='blood_bank_app.donorform')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('remaining__gt', 0)), fields=['blood_group', 'expiry_date', 'id'], name='bloodlot_fefo')],
+            },
+        ),
+        migrations.RunPython(lots_from_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_bank_app', '0038_bloodlot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='urgency',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Routine'), (2, 'Urgent'), (3, 'Emergency')], default=1),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_bank_app', '0040_stockhold'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='donorform',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['user', 'updated_at'], name='bloodreq_user_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='donorform',
+            index=models.Index(fields=['user', 'updated_at'], name='donorform_user_updated'),
+        ),
+    ]
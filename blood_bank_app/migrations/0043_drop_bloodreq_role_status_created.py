@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:59
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blood_bank_app', '0042_sharedversion'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bloodrequest',
+            name='bloodreq_role_status_created',
+        ),
+    ]
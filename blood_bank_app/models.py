@@ -1,3 +1,4 @@
+import time
 from django.db import models
 from django.contrib.auth import get_user_model
 from datetime import date, timedelta
@@ -13,6 +14,51 @@ BLOOD_GROUP_CHOICES = [
     ('O+', 'O+'), ('O-', 'O-'),
 ]
 
+SHELF_LIFE_DAYS = 35
+
+STOCK_VERSION = 'blood_stock'
+
+
+def read_version(name):
+    """Current value of the shared version counter ``name`` (one primary-key lookup).
+
+    Versions live in the database so every worker process sees the same value.
+    """
+    value = SharedVersion.objects.filter(pk=name).values_list('value', flat=True).first()
+    if value is None:
+        # Seed from the clock so a recreated row never reuses an old version.
+        SharedVersion.objects.bulk_create(
+            [SharedVersion(name=name, value=time.time_ns() // 1000)], ignore_conflicts=True
+        )
+        value = SharedVersion.objects.filter(pk=name).values_list('value', flat=True).first()
+    return value
+
+
+def bump_version(name):
+    if not SharedVersion.objects.filter(pk=name).update(value=models.F('value') + 1):
+        read_version(name)
+        SharedVersion.objects.filter(pk=name).update(value=models.F('value') + 1)
+    return read_version(name)
+
+
+def get_stock_version():
+    """Current stock version; changes whenever any BloodStock row is written."""
+    if settings.STOCK_SHM_NAME:
+        from . import sharedstock
+        current = sharedstock.read(settings.STOCK_SHM_NAME)
+        if current is not None:
+            return current[0]
+    return read_version(STOCK_VERSION)
+
+
+def bump_stock_version():
+    version = bump_version(STOCK_VERSION)
+    if settings.STOCK_SHM_NAME:
+        from . import sharedstock
+        sharedstock.publish(settings.STOCK_SHM_NAME)
+    return version
+
+
 class Credential(models.Model):
     ROLE_CHOICES = [
         ('Donor','Donor'),
@@ -23,26 +69,27 @@ class Credential(models.Model):
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='Donor')
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='credential')
 
+    class Meta:
+        indexes = [
+            # admin user lists, keyset-paginated on id within a role
+            models.Index(fields=['role'], name='credential_role'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.role}"
 
 class BloodStock(models.Model):
+    """Per-group balance of the unexpired BloodLot rows, maintained by ``inventory``."""
     BLOOD_GROUP = BLOOD_GROUP_CHOICES
     blood_group = models.CharField(max_length=5,choices=BLOOD_GROUP_CHOICES, unique=True)
     units = models.PositiveIntegerField(default=0)
     collected_date = models.DateField(default=date.today)
     expiry_date = models.DateField(blank=True, null=True)
 
-    def save(self, *args, **kwargs):
-        if not self.pk: 
-            self.collected_date = date.today()
-            self.expiry_date = self.collected_date + timedelta(days=35)
-        else:
-            old_stock = BloodStock.objects.filter(pk=self.pk).first()
-            if old_stock and old_stock.units != self.units:
-                self.collected_date = date.today()
-                self.expiry_date = self.collected_date + timedelta(days=35)
-        super().save(*args, **kwargs)
+    class Meta:
+        indexes = [
+            models.Index(fields=['expiry_date'], name='bloodstock_expiry'),
+        ]
 
     def is_expired(self):
         return date.today() > self.expiry_date if self.expiry_date else False
@@ -56,6 +103,53 @@ class BloodStock(models.Model):
         return f"{self.blood_group} ({self.units} units)"
 
 
+class BloodLot(models.Model):
+    """One collected batch of blood with its own expiry; allocated first-expiry-first-out."""
+    blood_group = models.CharField(max_length=5, choices=BLOOD_GROUP_CHOICES)
+    units = models.PositiveIntegerField()
+    remaining = models.PositiveIntegerField()
+    collected_date = models.DateField(default=date.today)
+    expiry_date = models.DateField()
+    donor = models.ForeignKey(
+        'DonorForm',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='lots'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # FEFO allocation only ever looks at lots that still hold units.
+            models.Index(
+                fields=['blood_group', 'expiry_date', 'id'],
+                name='bloodlot_fefo',
+                condition=models.Q(remaining__gt=0),
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.expiry_date:
+            self.expiry_date = self.collected_date + timedelta(days=SHELF_LIFE_DAYS)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.blood_group} lot {self.pk} ({self.remaining}/{self.units} units, expires {self.expiry_date})"
+
+
+class ExpiredStock(models.Model):
+    """A blood lot retired by the expiry sweeper."""
+    blood_group = models.CharField(max_length=5, choices=BLOOD_GROUP_CHOICES)
+    units = models.PositiveIntegerField()
+    collected_date = models.DateField()
+    expiry_date = models.DateField()
+    retired_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.blood_group} ({self.units} units) expired {self.expiry_date}"
+
+
 class DonorForm(models.Model):
     user = models.ForeignKey(
         User, 
@@ -88,10 +182,24 @@ class DonorForm(models.Model):
     last_receive_date = models.DateTimeField(null=True, blank=True)
     consent = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     STATUS_CHOICES = [('Pending', 'Pending'), ('Approved', 'Approved'), ('Rejected', 'Rejected')]                                                                                                                                                              
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
 
+    class Meta:
+        indexes = [
+            # donor_home / donor_history
+            models.Index(fields=['user', '-created_at'], name='donorform_user_created'),
+            # admin donor queue, keyset-paginated on (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='donorform_created'),
+            models.Index(fields=['status', '-created_at', '-id'], name='donorform_status_created'),
+            # delete_my_donor_requests
+            models.Index(fields=['email'], name='donorform_email'),
+            # donor_history ETag / Last-Modified
+            models.Index(fields=['user', 'updated_at'], name='donorform_user_updated'),
+        ]
+
 
 
 
@@ -106,14 +214,50 @@ class BloodRequest(models.Model):
     blood_group = models.CharField(max_length=5)
     units = models.PositiveIntegerField()
     gender = models.CharField(max_length=10)
+    ROUTINE, URGENT, EMERGENCY = 1, 2, 3
+    URGENCY_CHOICES = [(ROUTINE, 'Routine'), (URGENT, 'Urgent'), (EMERGENCY, 'Emergency')]
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='Patient')
+    urgency = models.PositiveSmallIntegerField(choices=URGENCY_CHOICES, default=ROUTINE)
     status = models.CharField(max_length=20, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     admin_message = models.TextField(blank=True, null=True) 
 
+    class Meta:
+        indexes = [
+            # patient_request_history
+            models.Index(fields=['user', '-created_at'], name='bloodreq_user_created'),
+            # hospital_request_history and per-user status filters
+            models.Index(fields=['user', 'role', 'status', '-created_at'], name='bloodreq_user_role_status'),
+            # admin_blood_request queue, keyset-paginated on (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='bloodreq_created'),
+            models.Index(fields=['status', '-created_at', '-id'], name='bloodreq_status_created'),
+            # request history ETag / Last-Modified
+            models.Index(fields=['user', 'updated_at'], name='bloodreq_user_updated'),
+        ]
+
     def __str__(self):
         return f"{self.fname} ({self.blood_group}) - {self.status}"
 
+class StockHold(models.Model):
+    """Units set aside for a blood request while an admin reviews it, until ``expires_at``."""
+    request = models.ForeignKey(BloodRequest, on_delete=models.CASCADE, related_name='holds')
+    blood_group = models.CharField(max_length=5, choices=BLOOD_GROUP_CHOICES)
+    units = models.PositiveIntegerField()
+    held_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Covers the per-group sum of active holds in the available stock read.
+            models.Index(fields=['blood_group', 'expires_at', 'units'], name='stockhold_group_expiry'),
+        ]
+
+    def __str__(self):
+        return f"{self.units} units of {self.blood_group} held for request {self.request_id} until {self.expires_at}"
+
+
 class HospitalDetails(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True)
     name = models.CharField(max_length=255)
@@ -203,3 +347,29 @@ class DonorProfile(models.Model):
 
     def __str__(self):
         return f"{self.name} ({self.blood_group})"
+
+
+class StatusCounter(models.Model):
+    """Materialized per-status row counts, kept in step with DonorForm/BloodRequest writes."""
+    KIND_CHOICES = [('donor_form', 'Donor form'), ('blood_request', 'Blood request')]
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    scope = models.CharField(max_length=50)
+    status = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'scope', 'status'], name='unique_status_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.scope} {self.status}: {self.count}"
+
+
+class SharedVersion(models.Model):
+    """A named counter every process reads to tell whether its in-memory copies are stale."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
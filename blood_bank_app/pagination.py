@@ -0,0 +1,145 @@
+import base64
+import json
+from urllib.parse import urlencode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+PAGE_SIZE = 50
+
+
+class KeysetPage:
+    """One page of a keyset-paginated list; iterates over its rows."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, params):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_query(self):
+        return urlencode({**self.params, 'after': self.next_cursor})
+
+    def previous_query(self):
+        return urlencode({**self.params, 'before': self.previous_cursor})
+
+    def first_query(self):
+        return urlencode(self.params)
+
+
+class OffsetPage(KeysetPage):
+    """One page of a list ordered in memory, addressed by ``offset`` in the query string.
+
+    For orderings no index serves, such as the scheduler's priority queue. The
+    order can shift between requests, so a row may repeat or be skipped at a page
+    boundary; nothing is lost, it moves to a neighbouring page.
+    """
+
+    def __init__(self, object_list, offset, total, params, page_size=PAGE_SIZE):
+        super().__init__(
+            object_list,
+            next_cursor=offset + page_size if offset + page_size < total else None,
+            previous_cursor=max(offset - page_size, 0) if offset else None,
+            params=params,
+        )
+        self.offset = offset
+        self.total = total
+
+    @property
+    def start_index(self):
+        """1-based position of the first row on this page, as in Django's Page."""
+        return self.offset + 1 if self.object_list else 0
+
+    @property
+    def end_index(self):
+        return self.offset + len(self.object_list)
+
+    def next_query(self):
+        return urlencode({**self.params, 'offset': self.next_cursor})
+
+    def previous_query(self):
+        return urlencode({**self.params, 'offset': self.previous_cursor})
+
+
+def page_offset(request):
+    """The non-negative ``offset`` GET parameter; 0 when missing or malformed."""
+    offset = request.GET.get('offset', '')
+    return int(offset) if offset.isdigit() else 0
+
+
+def list_filters(request, *names):
+    """The non-empty GET parameters among ``names``, usable as queryset filters."""
+    return {name: request.GET[name] for name in names if request.GET.get(name)}
+
+
+def _encode(obj, keys):
+    values = [str(getattr(obj, key)) for key in keys]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode(cursor, model, keys):
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if len(values) != len(keys):
+        raise ValueError("Cursor does not match the list ordering.")
+    return [model._meta.get_field(key).to_python(value) for key, value in zip(keys, values)]
+
+
+def _beyond(keys, values, lookup):
+    # Row-value comparison (k1, k2) < (v1, v2) written so the leading key keeps an
+    # index-usable range bound: k1 <= v1 AND (k1 < v1 OR (k2, ...) < (v2, ...)).
+    first = keys[0]
+    if len(keys) == 1:
+        return Q(**{f'{first}__{lookup}': values[0]})
+    return Q(**{f'{first}__{lookup}e': values[0]}) & (
+        Q(**{f'{first}__{lookup}': values[0]}) | _beyond(keys[1:], values[1:], lookup)
+    )
+
+
+def keyset_paginate(request, queryset, keys=('created_at', 'id'), params=None, page_size=PAGE_SIZE):
+    """Newest-first page of ``queryset`` ordered by ``keys`` (descending), driven by
+    the ``after``/``before`` cursors in the query string. Every page is a bounded
+    index range read; there is no OFFSET.
+    """
+    keys = list(keys)
+    params = params or {}
+    descending = [f'-{key}' for key in keys]
+    after, before = request.GET.get('after'), request.GET.get('before')
+    try:
+        if after:
+            queryset = queryset.filter(_beyond(keys, _decode(after, queryset.model, keys), 'lt'))
+        elif before:
+            queryset = queryset.filter(_beyond(keys, _decode(before, queryset.model, keys), 'gt'))
+    except (ValueError, TypeError, ValidationError):
+        after = before = None
+
+    if before:
+        rows = list(queryset.order_by(*keys)[:page_size + 1])
+        more = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_previous, has_next = more, True
+    else:
+        rows = list(queryset.order_by(*descending)[:page_size + 1])
+        more = len(rows) > page_size
+        rows = rows[:page_size]
+        has_previous, has_next = bool(after), more
+
+    return KeysetPage(
+        rows,
+        next_cursor=_encode(rows[-1], keys) if rows and has_next else None,
+        previous_cursor=_encode(rows[0], keys) if rows and has_previous else None,
+        params=params,
+    )
@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .inventory import InsufficientStock
+from .models import BloodStock, StockHold
+
+
+def active_holds(now=None):
+    # Expired holds are never deleted on a schedule: every read simply ignores them,
+    # and the next hold placed on the same group clears them out.
+    return StockHold.objects.filter(expires_at__gt=now or timezone.now())
+
+
+def available_stock(now=None):
+    """BloodStock rows annotated with ``held`` and ``available`` (units minus active
+    holds). One query; the holds are summed from the ``stockhold_group_expiry`` index.
+    """
+    held = (
+        active_holds(now).filter(blood_group=OuterRef('blood_group'))
+        .values('blood_group').annotate(total=Sum('units')).values('total')
+    )
+    return BloodStock.objects.annotate(held=Coalesce(Subquery(held), 0)).annotate(
+        available=F('units') - F('held')
+    )
+
+
+def available_balances():
+    return dict(available_stock().values_list('blood_group', 'available'))
+
+
+def held_units(exclude_requests=()):
+    """``{blood_group: units}`` held by active holds of requests other than ``exclude_requests``."""
+    holds = active_holds().exclude(request__in=[req.pk for req in exclude_requests])
+    return dict(holds.values('blood_group').annotate(total=Sum('units')).values_list('blood_group', 'total'))
+
+
+def holds_for(requests):
+    """``{request_id: expires_at}`` of the active holds on ``requests``."""
+    holds = active_holds().filter(request__in=[req.pk for req in requests])
+    return dict(holds.values_list('request_id', 'expires_at'))
+
+
+@transaction.atomic
+def place_hold(req, user=None, ttl=None):
+    """Hold ``req.units`` of ``req.blood_group`` for ``ttl`` seconds (``STOCK_HOLD_TTL`` by
+    default), replacing any hold the request already had. Raises InsufficientStock if
+    the units are not available net of other holds.
+    """
+    now = timezone.now()
+    ttl = settings.STOCK_HOLD_TTL if ttl is None else ttl
+    # Lock the balance row so two admins cannot hold the same units at once.
+    list(BloodStock.objects.select_for_update().filter(blood_group=req.blood_group))
+    StockHold.objects.filter(blood_group=req.blood_group, expires_at__lte=now).delete()
+    StockHold.objects.filter(request=req).delete()
+    available = available_stock(now).filter(blood_group=req.blood_group).values_list('available', flat=True).first()
+    if req.units > (available or 0):
+        raise InsufficientStock(req.blood_group, req.units, max(available or 0, 0))
+    return StockHold.objects.create(
+        request=req,
+        blood_group=req.blood_group,
+        units=req.units,
+        held_by=user,
+        expires_at=now + timedelta(seconds=ttl),
+    )
+
+
+def release(requests):
+    StockHold.objects.filter(request__in=[req.pk for req in requests]).delete()
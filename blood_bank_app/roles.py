@@ -0,0 +1,102 @@
+from collections import namedtuple
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
+from django.shortcuts import redirect
+
+from .models import Credential, DonorProfile, HospitalDetails, PatientProfile
+
+SESSION_KEY = '_role'
+
+PROFILE_MODELS = {
+    'Hospital': HospitalDetails,
+    'Patient': PatientProfile,
+    'Donor': DonorProfile,
+}
+
+Role = namedtuple('Role', 'name has_profile')
+
+# Not a Credential value: only ``is_superuser`` confers it, never a stored role.
+ADMIN = Role('superuser', True)
+
+
+def resolve(user):
+    """The user's Credential role and whether its profile exists (``name`` is None without a Credential).
+
+    One query: the Credential row with an ``EXISTS`` per profile table, each a
+    lookup on that table's unique ``user_id``.
+    """
+    flags = {
+        role: Exists(model.objects.filter(user=OuterRef('user')))
+        for role, model in PROFILE_MODELS.items()
+    }
+    row = Credential.objects.filter(user=user).annotate(**flags).values('role', *flags).first()
+    if row is None:
+        return Role(None, False)
+    return Role(row['role'], row.get(row['role'], False))
+
+
+def remember(request, role):
+    """Store ``role`` in the (already logged-in) session and on the request."""
+    request.session[SESSION_KEY] = {'user': request.user.pk, **role._asdict()}
+    request.role = role
+    return role
+
+
+def current(request):
+    """``request.role``: read from the session, resolved once if it is not there yet."""
+    if not request.user.is_authenticated:
+        return None
+    stored = request.session.get(SESSION_KEY)
+    if stored and stored['user'] == request.user.pk:
+        return Role(stored['name'], stored['has_profile'])
+    return remember(request, ADMIN if request.user.is_superuser else resolve(request.user))
+
+
+def has_role(request, name):
+    """Whether the user acts as ``name``. The admin check reads ``is_superuser`` from
+    the user loaded for this request, so a demotion takes effect at once.
+    """
+    if name == ADMIN.name:
+        return request.user.is_superuser
+    return bool(request.role) and request.role.name == name
+
+
+def role_required(*names):
+    """View decorator: only users who have one of the roles ``names`` get in; anyone
+    else goes back to the landing page. Apply under ``login_required``.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not any(has_role(request, name) for name in names):
+                return redirect('home')
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def profile_saved(request):
+    """Mark the user's profile as existing once a profile view has created it."""
+    role = current(request)
+    if role and not role.has_profile:
+        remember(request, role._replace(has_profile=True))
+
+
+_UNSET = object()
+_admin_user = _UNSET
+
+
+def admin_user():
+    """The first superuser, looked up once per process."""
+    global _admin_user
+    if _admin_user is _UNSET:
+        _admin_user = get_user_model().objects.filter(is_superuser=True).first()
+    return _admin_user
+
+
+def forget_admin_user(**kwargs):
+    global _admin_user
+    _admin_user = _UNSET
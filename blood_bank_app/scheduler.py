@@ -0,0 +1,101 @@
+import heapq
+import threading
+from collections import namedtuple
+
+from django.db import transaction
+
+from . import compatibility
+from .models import BloodRequest, bump_version, read_version
+
+QUEUE_VERSION = 'blood_request_queue'
+
+Entry = namedtuple('Entry', 'pk urgency created_at blood_group units')
+
+
+def _priority(entry, balances):
+    # Most urgent first; within an urgency, requests stock can cover now before
+    # those it cannot, then oldest first.
+    servable = compatibility.fulfillment(entry.blood_group, entry.units, balances) is not None
+    return (-entry.urgency, not servable, entry.created_at, entry.pk)
+
+
+class PendingQueue:
+    """In-process index of the pending blood requests, kept current by ``changed``.
+
+    Each write bumps a shared version row. A process that sees its own
+    write land right after the version it holds applies the change in place;
+    any other gap means another process wrote too, and the index is reloaded
+    with one indexed query on the next read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._version = None
+
+    def _load(self):
+        version = read_version(QUEUE_VERSION)
+        rows = BloodRequest.objects.filter(status='Pending').values_list(
+            'pk', 'urgency', 'created_at', 'blood_group', 'units'
+        )
+        self._entries = {row[0]: Entry(*row) for row in rows}
+        self._version = version
+
+    def changed(self, requests):
+        """Schedule the index update for ``requests`` once the current transaction commits."""
+        # Rows fresh from a form still hold the raw POST strings.
+        entries = [
+            (req.pk, Entry(req.pk, int(req.urgency), req.created_at, req.blood_group, int(req.units))
+             if req.status == 'Pending' else None)
+            for req in requests
+        ]
+        if entries:
+            transaction.on_commit(lambda: self._apply(entries))
+
+    def _apply(self, entries):
+        version = bump_version(QUEUE_VERSION)
+        with self._lock:
+            if self._version is None or version != self._version + 1:
+                self._version = None
+                return
+            for pk, entry in entries:
+                if entry is None:
+                    self._entries.pop(pk, None)
+                else:
+                    self._entries[pk] = entry
+            self._version = version
+
+    def top(self, balances, limit, blood_group=None, offset=0):
+        """The ``limit`` highest-priority pending entries after the first ``offset``,
+        plus how many are pending in all.
+        """
+        with self._lock:
+            if self._version != read_version(QUEUE_VERSION):
+                self._load()
+            entries = list(self._entries.values())
+        if blood_group:
+            entries = [entry for entry in entries if entry.blood_group == blood_group]
+        ranked = heapq.nsmallest(offset + limit, entries, key=lambda entry: _priority(entry, balances))
+        return ranked[offset:], len(entries)
+
+    def invalidate(self):
+        """Reload from the database on the next read."""
+        with self._lock:
+            self._version = None
+
+    def discard(self, pks):
+        with self._lock:
+            for pk in pks:
+                self._entries.pop(pk, None)
+
+
+queue = PendingQueue()
+
+
+def pending_page(balances, limit, blood_group=None, offset=0):
+    """A slice of the pending queue as BloodRequest rows, fetched by primary key."""
+    entries, total = queue.top(balances, limit, blood_group, offset)
+    rows = BloodRequest.objects.in_bulk([entry.pk for entry in entries])
+    # Rows deleted behind the index's back (e.g. with their user) just drop out.
+    queue.discard([entry.pk for entry in entries if entry.pk not in rows])
+    return [rows[entry.pk] for entry in entries if entry.pk in rows], total
@@ -0,0 +1,155 @@
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialised within the process.
+    fcntl = None
+
+from .models import BLOOD_GROUP_CHOICES, STOCK_VERSION, BloodStock, read_version
+
+logger = logging.getLogger(__name__)
+
+GROUPS = [group for group, _ in BLOOD_GROUP_CHOICES]
+
+# Layout: sequence, version, then one total per blood group, all native 64-bit.
+_SEQUENCE = struct.Struct('=Q')
+_VERSION = struct.Struct('=q')
+_HEADER = struct.Struct('=Qq')
+_TOTALS = struct.Struct(f'={len(GROUPS)}q')
+SIZE = _HEADER.size + _TOTALS.size
+
+# A write takes microseconds; a sequence still odd after this many looks means the
+# writer died mid-write, and readers fall back to the database.
+READ_ATTEMPTS = 10_000
+
+
+def _open(name):
+    try:
+        shm = shared_memory.SharedMemory(name=name, create=True, size=SIZE)
+    except FileExistsError:
+        shm = shared_memory.SharedMemory(name=name)
+    # The block outlives any one worker, so keep the resource tracker from
+    # unlinking it when the process that happened to create it exits.
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class SharedStock:
+    """Stock version and per-group totals in one shared memory block per host.
+
+    Reads are lock-free and make no system calls: a writer makes the sequence
+    odd, writes, then makes it even again, and a reader retries until it sees
+    the same even sequence before and after copying the payload (a seqlock).
+    Writers serialise on an ``flock`` so two workers cannot interleave.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._shm = _open(name)
+        self._buf = self._shm.buf
+        self._thread_lock = threading.Lock()
+        self._lock_path = os.path.join(tempfile.gettempdir(), f'{name}.lock')
+
+    def read(self, attempts=READ_ATTEMPTS):
+        """``(version, {blood_group: units})``, or ``None`` before the first ``write``.
+        Raises TimeoutError if no consistent copy is seen in ``attempts`` tries.
+        """
+        buf = self._buf
+        for _ in range(attempts):
+            sequence, version = _HEADER.unpack_from(buf, 0)
+            if sequence & 1:
+                continue
+            totals = _TOTALS.unpack_from(buf, _HEADER.size)
+            if _SEQUENCE.unpack_from(buf, 0)[0] == sequence:
+                return (version, dict(zip(GROUPS, totals))) if sequence else None
+        raise TimeoutError(f"shared stock block {self.name} stayed mid-write for {attempts} reads")
+
+    @contextmanager
+    def _writer(self):
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def write(self, totals, version=None):
+        """Publish ``totals`` (a dict, or a callable returning one, called under the
+        writer lock so concurrent publishers cannot reorder); the version becomes
+        ``version`` (a value or such a callable) or the next one. Returns the version written.
+        """
+        buf = self._buf
+        with self._writer():
+            if callable(totals):
+                totals = totals()
+            if callable(version):
+                version = version()
+            sequence, current = _HEADER.unpack_from(buf, 0)
+            # Odd under the lock means a writer died mid-write; this write repairs it.
+            sequence += sequence & 1
+            if version is None:
+                # Seed from the clock so a rebooted host never reuses an old version.
+                version = current + 1 if sequence else time.time_ns() // 1000
+            _SEQUENCE.pack_into(buf, 0, sequence + 1)
+            _VERSION.pack_into(buf, _SEQUENCE.size, version)
+            _TOTALS.pack_into(buf, _HEADER.size, *(totals.get(group, 0) for group in GROUPS))
+            _SEQUENCE.pack_into(buf, 0, sequence + 2)
+        return version
+
+    def close(self, unlink=False):
+        self._buf = None
+        self._shm.close()
+        if unlink:
+            # unlink() unregisters the block again, so hand it back to the tracker first.
+            resource_tracker.register(self._shm._name, 'shared_memory')
+            self._shm.unlink()
+
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def attach(name):
+    """This process's mapping of the block ``name``, created on first use."""
+    block = _blocks.get(name)
+    if block is None:
+        with _blocks_lock:
+            block = _blocks.get(name) or _blocks.setdefault(name, SharedStock(name))
+    return block
+
+
+def publish(name):
+    """Re-read the BloodStock totals and the shared stock version and publish them, so
+    the block always carries the same version a database reader would see.
+    """
+    return attach(name).write(
+        lambda: dict(BloodStock.objects.values_list('blood_group', 'units')),
+        version=lambda: read_version(STOCK_VERSION),
+    )
+
+
+def read(name):
+    """The published ``(version, totals)``, publishing from the database first if empty.
+    ``None`` if the block is stuck mid-write; callers then read the database instead.
+    """
+    block = attach(name)
+    try:
+        current = block.read()
+        if current is None:
+            publish(name)
+            current = block.read()
+    except TimeoutError:
+        logger.warning("Shared stock block %s is stuck mid-write; reading the database", name)
+        return None
+    return current
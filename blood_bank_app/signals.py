@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import events, roles
+from .models import BloodStock, bump_stock_version
+
+
+@receiver([post_save, post_delete], sender=BloodStock)
+def stock_changed(sender, **kwargs):
+    # Queryset updates skip these signals; inventory.refresh_balances bumps the version itself.
+    transaction.on_commit(bump_stock_version)
+    events.stock_changed()
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def user_changed(sender, update_fields=None, **kwargs):
+    # Every login saves last_login alone; that cannot change who the superuser is.
+    if update_fields != frozenset({'last_login'}):
+        roles.forget_admin_user()
@@ -0,0 +1,51 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import sharedstock
+from .models import BloodStock, get_stock_version
+
+SNAPSHOT_KEY = 'blood_stock:snapshot'
+
+StockSnapshot = namedtuple('StockSnapshot', 'version stocks')
+
+_local = None
+
+
+def stock_snapshot():
+    """All BloodStock rows by blood group, as dicts, read through ``STOCK_CACHE_ALIAS``.
+
+    The entry is stamped with the stock version it was read at and is only served
+    while that version is current, so a stock write in any worker invalidates it.
+    The last snapshot is also kept in the process, so a warm read costs only the
+    version lookup.
+    """
+    global _local
+    version = get_stock_version()
+    snapshot = _local
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    store = caches[settings.STOCK_CACHE_ALIAS]
+    snapshot = store.get(SNAPSHOT_KEY)
+    if snapshot is None or snapshot.version != version:
+        rows = BloodStock.objects.order_by('blood_group').values(
+            'id', 'blood_group', 'units', 'collected_date', 'expiry_date'
+        )
+        snapshot = StockSnapshot(version, list(rows))
+        store.set(SNAPSHOT_KEY, snapshot, timeout=None)
+    _local = snapshot
+    return snapshot
+
+
+def stock_totals():
+    """``{blood_group: units}`` for every group: from shared memory when
+    ``STOCK_SHM_NAME`` is set and readable, otherwise from the cached snapshot.
+    """
+    if settings.STOCK_SHM_NAME:
+        current = sharedstock.read(settings.STOCK_SHM_NAME)
+        if current is not None:
+            return current[1]
+    totals = dict.fromkeys(sharedstock.GROUPS, 0)
+    totals.update((stock['blood_group'], stock['units']) for stock in stock_snapshot().stocks)
+    return totals
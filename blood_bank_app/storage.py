@@ -0,0 +1,16 @@
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Hashed, precompressed static files that degrade to plain URLs.
+
+    A name missing from the manifest (collectstatic not run yet, as under the
+    test runner, or a file that was never shipped) resolves to its unhashed
+    URL instead of failing the whole page.
+    """
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
@@ -1,3 +1,966 @@
-from django.test import TestCase
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock, skipIf, skipUnless
+from xml.dom.minidom import parseString
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Sum
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.template.loader import get_template
+from django.templatetags.static import static
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import (
+    allocation, bulk, charts, compatibility, counters, events, expiry, hashers, inventory, reservations, roles,
+    scheduler, sharedstock,
+)
+from .models import (
+    STOCK_VERSION, BloodLot, BloodRequest, BloodStock, Credential, DonorForm, ExpiredStock, PatientProfile,
+    StatusCounter, StockHold,
+    bump_version, get_stock_version, read_version,
+)
+from .metrics import admin_dashboard_metrics, donor_home_metrics, hospital_home_metrics, patient_home_metrics
+from .pagination import PAGE_SIZE, keyset_paginate
+from .snapshot import stock_snapshot, stock_totals
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite specific.")
+class QueryPlanTests(TestCase):
+    """The per-user history and admin queue queries must be served by an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('plan', 'plan@example.com', 'pw')
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        self.assertRegex(plan, r'USING (COVERING )?INDEX \w+')
+        self.assertIsNone(re.search(r'\bSCAN \w+\s*$', plan, re.MULTILINE), plan)
+
+    def test_patient_request_history(self):
+        self.assertUsesIndex(BloodRequest.objects.filter(user=self.user).order_by('-created_at'))
+
+    def test_hospital_request_history(self):
+        self.assertUsesIndex(
+            BloodRequest.objects.filter(user=self.user, role='Hospital').order_by('-created_at')
+        )
+
+    def test_per_user_status_filter(self):
+        self.assertUsesIndex(
+            BloodRequest.objects.filter(user=self.user, role='Patient', status='Pending')
+        )
+
+    def test_admin_request_queue(self):
+        # Plan the SQL the view really sends: the keyset pages, with and without a
+        # status filter, a following page, and the load of the pending index.
+        BloodRequest.objects.bulk_create(
+            BloodRequest(fname=f'q{i}', email='q@example.com', phonenum='1', age=30, reason='-',
+                         blood_group='A+', units=1, gender='Male')
+            for i in range(PAGE_SIZE + 1)
+        )
+        scheduler.queue.invalidate()
+        self.client.force_login(User.objects.create_superuser('queue', 'queue@example.com', 'pw'))
+        cursor = self.client.get(reverse('admin_blood_request'), {'status': ''}).context['page'].next_cursor
+        pages = ({'status': ''}, {'status': 'Accepted'}, {}, {'offset': PAGE_SIZE}, {'status': '', 'after': cursor})
+        for params in pages:
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('admin_blood_request'), params)
+            selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')
+                       and 'FROM "blood_bank_app_bloodrequest"' in query['sql']]
+            self.assertTrue(selects, params)
+            for sql in selects:
+                with connection.cursor() as plan_cursor:
+                    plan_cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                    plan = '\n'.join(row[-1] for row in plan_cursor.fetchall())
+                self.assertIsNone(re.search(r'^SCAN \w+$', plan, re.MULTILINE), f'{sql}\n{plan}')
+
+    def test_donor_history(self):
+        self.assertUsesIndex(DonorForm.objects.filter(user=self.user).order_by('-created_at'))
+
+    def test_donor_status_queue(self):
+        self.assertUsesIndex(DonorForm.objects.filter(status='Pending').order_by('-created_at'))
+
+    def test_delete_my_donor_requests(self):
+        self.assertUsesIndex(DonorForm.objects.filter(email=self.user.email))
+
+    def test_available_stock_sums_holds_from_the_index(self):
+        self.assertIn('USING COVERING INDEX stockhold_group_expiry', reservations.available_stock().explain())
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        BloodRequest.objects.bulk_create(
+            BloodRequest(fname=f'r{i}', email='r@example.com', phonenum='1', age=30, reason='-',
+                         blood_group='A+', units=1, gender='Male')
+            for i in range(25)
+        )
+        # Ties on created_at must be broken by id without skipping or repeating rows.
+        BloodRequest.objects.filter(pk__in=list(BloodRequest.objects.values_list('pk', flat=True)[:12])).update(
+            created_at=BloodRequest.objects.order_by('created_at').first().created_at
+        )
+
+    def _page(self, **params):
+        return keyset_paginate(RequestFactory().get('/', params), BloodRequest.objects.all(), page_size=10)
+
+    def test_walks_every_row_once_in_order(self):
+        seen, page = [], self._page()
+        while True:
+            seen.extend(row.pk for row in page)
+            if not page.has_next:
+                break
+            page = self._page(after=page.next_cursor)
+        expected = list(BloodRequest.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_previous_returns_to_the_earlier_page(self):
+        first = self._page()
+        second = self._page(after=first.next_cursor)
+        back = self._page(before=second.previous_cursor)
+        self.assertEqual([row.pk for row in back], [row.pk for row in first])
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        self.assertEqual([row.pk for row in self._page(after='not-a-cursor')], [row.pk for row in self._page()])
+
+
+class InventoryTests(TestCase):
+
+    def test_allocate_takes_first_expiring_lots_first(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            old = inventory.receive('A+', 5, collected_date=date.today() - timedelta(days=30))
+            new = inventory.receive('A+', 7)
+            inventory.allocate('A+', 6)
+        old.refresh_from_db()
+        new.refresh_from_db()
+        self.assertEqual((old.remaining, new.remaining), (0, 6))
+        stock = BloodStock.objects.get(blood_group='A+')
+        self.assertEqual((stock.units, stock.expiry_date), (6, new.expiry_date))
+
+    def test_shortage_changes_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lot = inventory.receive('O-', 3)
+        with self.assertRaises(inventory.InsufficientStock) as raised:
+            inventory.allocate('O-', 4)
+        self.assertEqual(raised.exception.available, 3)
+        lot.refresh_from_db()
+        self.assertEqual(lot.remaining, 3)
+        self.assertEqual(BloodStock.objects.get(blood_group='O-').units, 3)
+
+    def test_edit_form_shows_and_sets_the_live_balance(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.receive('A+', 5)
+        BloodLot.objects.create(blood_group='A+', units=3, remaining=3, collected_date=date.today() - timedelta(days=40),
+                                expiry_date=date.today() - timedelta(days=5))
+        # The row still counts a lot that expired after it was last refreshed.
+        BloodStock.objects.filter(blood_group='A+').update(units=8)
+        url = reverse('update_blood_stock', args=[BloodStock.objects.get(blood_group='A+').pk])
+        self.client.force_login(User.objects.create_superuser('stock', 'stock@example.com', 'pw'))
+        self.assertEqual(self.client.get(url).context['stock'].units, 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'units': 4})
+        self.assertEqual(inventory.available_units('A+'), 4)
+        self.assertEqual(BloodStock.objects.get(blood_group='A+').units, 4)
+
+
+class ExpirySweepTests(TestCase):
+
+    def setUp(self):
+        expired = date.today() - timedelta(days=40)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.live = inventory.receive('A+', 4)
+            for units in range(1, 6):
+                inventory.receive(['A+', 'O-'][units % 2], units, collected_date=expired)
+        # The balances were refreshed before those lots expired.
+        BloodStock.objects.filter(blood_group='A+').update(units=10)
+        BloodStock.objects.filter(blood_group='O-').update(units=9)
+
+    def test_retires_expired_lots_in_batches(self):
+        version = get_stock_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(expiry.sweep_expired_stock(batch_size=2), 5)
+        logged = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "blood_bank_app_expiredstock"')]
+        self.assertEqual(len(logged), 3)
+        self.assertEqual(sorted(ExpiredStock.objects.values_list('units', flat=True)), [1, 2, 3, 4, 5])
+        self.assertEqual(list(BloodLot.objects.filter(remaining__gt=0)), [self.live])
+        self.assertEqual(dict(BloodStock.objects.values_list('blood_group', 'units')), {'A+': 4, 'O-': 0})
+        self.assertNotEqual(get_stock_version(), version)
+        self.assertEqual(expiry.sweep_expired_stock(), 0)
+
+    def test_command_reports_the_lots_it_retired(self):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('sweep_expired_stock', batch_size=1, stdout=out)
+        self.assertIn('Retired 5 expired stock record(s).', out.getvalue())
+        self.assertEqual(ExpiredStock.objects.count(), 5)
+        self.assertEqual(BloodStock.objects.get(blood_group='O-').units, 0)
+
+    def test_one_worker_claims_each_sweep(self):
+        now = time.time()
+        self.assertEqual([expiry.claim_sweep(60, now) for _ in range(3)], [True, False, False])
+        self.assertFalse(expiry.claim_sweep(60, now + 59))
+        self.assertTrue(expiry.claim_sweep(60, now + 61))
+
+
+class BulkActionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('bulk', 'bulk@example.com', 'pw')
+        cls.donors = User.objects.bulk_create(
+            User(username=f'donor{i}', email=f'donor{i}@example.com') for i in range(50)
+        )
+
+    def test_approving_500_donor_forms_is_a_handful_of_queries(self):
+        forms = DonorForm.objects.bulk_create(
+            DonorForm(user=self.donors[i % 50], firstname=f'd{i}', email='d@example.com', phone='1',
+                      gender='Male', blood_group=['A+', 'O-'][i % 2], units=1)
+            for i in range(500)
+        )
+        counters.record_many(counters.DONOR_FORM, [(form.user_id, None, None, 'Pending', 1) for form in forms])
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.receive('A+', 1)
+            inventory.receive('O-', 1)
+            with CaptureQueriesContext(connection) as queries:
+                approved = bulk.set_donor_status([form.pk for form in forms], 'Approved', self.admin)
+        self.assertEqual(len(approved), 500)
+        self.assertLess(len(queries), 20)
+        self.assertEqual(BloodStock.objects.get(blood_group='A+').units, 251)
+        self.assertEqual(BloodLot.objects.filter(blood_group='O-').count(), 251)
+        self.assertEqual(counters.read_counts(counters.DONOR_FORM, counters.GLOBAL_SCOPE)['Approved'], 500)
+        self.assertEqual(counters.rebuild_counters(), set())
+
+    def test_requests_beyond_stock_stay_pending(self):
+        inventory.receive('B+', 5)
+        reqs = BloodRequest.objects.bulk_create(
+            BloodRequest(fname=f'r{i}', email='r@example.com', phonenum='1', age=30, reason='-',
+                         blood_group='B+', units=units, gender='Male')
+            for i, units in enumerate([2, 4, 3])
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            accepted, short = bulk.approve_requests([req.pk for req in reqs])
+        self.assertEqual([req.units for req in accepted], [2, 3])
+        self.assertEqual([req.units for req in short], [4])
+        self.assertEqual(BloodRequest.objects.get(pk=short[0].pk).status, 'Pending')
+        self.assertEqual(BloodStock.objects.get(blood_group='B+').units, 0)
+
+
+class CounterTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('counts', 'counts@example.com', 'pw')
+        self.donor = Client()
+        self.donor.force_login(User.objects.create_user('counted', 'counted@example.com', 'pw'))
+        self.client.force_login(self.admin)
+
+    def assertCountersMatchARecount(self):
+        expected = counters.compute_counter_rows(DonorForm.objects.all(), BloodRequest.objects.all())
+        stored = {(c.kind, c.scope, c.status): c.count for c in StatusCounter.objects.exclude(count=0)}
+        self.assertEqual(stored, {key: count for key, count in expected.items() if count})
+        self.assertEqual(counters.rebuild_counters(), set())
+
+    def donate(self, units=2):
+        self.donor.post(reverse('donateform'), {
+            'fname': 'd', 'phonenum': '1', 'age': 30, 'blood_group': 'A+', 'units': units, 'gender': 'Male',
+        })
+        return DonorForm.objects.latest('pk')
+
+    def request_blood(self, client, url, units=1, **fields):
+        client.post(reverse(url), {
+            'fname': 'p', 'hospitalname': 'h', 'email': 'p@example.com', 'phonenum': '1', 'age': 30,
+            'reason': '-', 'address': '-', 'blood_group': 'A+', 'units': units, 'gender': 'Male', **fields,
+        })
+        return BloodRequest.objects.latest('pk')
+
+    def test_every_mutation_path_keeps_the_counters_exact(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first, second = self.donate(), self.donate(3)
+            self.assertCountersMatchARecount()
+            self.client.get(reverse('update_donor_status', args=[first.pk, 'Approved']))
+            self.client.get(reverse('update_donor_status', args=[second.pk, 'Rejected']))
+            self.assertCountersMatchARecount()
+
+            patient = self.request_blood(self.donor, 'requestform')
+            hospital = self.request_blood(self.donor, 'hospitalrequest', units=50)
+            self.assertCountersMatchARecount()
+            self.client.get(reverse('approve_request', args=[patient.pk]))
+            self.client.get(reverse('reject_request', args=[hospital.pk]))
+            self.assertEqual(BloodRequest.objects.get(pk=patient.pk).status, 'Accepted')
+            self.assertCountersMatchARecount()
+
+            for action, units in [('approve_request', 2), ('reject_request', 3)]:
+                offer = BloodRequest.objects.create(
+                    user=first.user, fname='d', email=first.email, phonenum='1', age=30, reason='-',
+                    blood_group='A+', units=units, gender='Male', role='Donor',
+                )
+                counters.blood_request_changed(offer, None)
+                self.client.get(reverse(action, args=[offer.pk]))
+            self.assertCountersMatchARecount()
+
+            self.donate()
+            self.donor.get(reverse('delete_my_donor_requests'))
+            self.assertFalse(DonorForm.objects.exists())
+            self.assertCountersMatchARecount()
+            self.donate()
+            self.client.get(reverse('delete_all_donor_requests'))
+            self.assertCountersMatchARecount()
+
+    def test_metrics_are_a_fixed_handful_of_queries(self):
+        for _ in range(3):
+            self.donate()
+            self.request_blood(self.donor, 'requestform')
+        user = DonorForm.objects.first().user
+        stock_totals()
+        # Two counter lookups plus the stock version that keys the cached snapshot.
+        with self.assertNumQueries(3):
+            metrics = admin_dashboard_metrics()
+        self.assertEqual((metrics['available_donors'], metrics['total_requests']), (3, 6))
+        with self.assertNumQueries(1):
+            self.assertEqual(donor_home_metrics(user)['pending_requests'], 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(patient_home_metrics(user)['total_requests'], 3)
+        with self.assertNumQueries(2):
+            self.assertEqual(hospital_home_metrics(user)['available_donors'], 3)
+
+
+class AllocationTests(TestCase):
+
+    def _requests(self, *units, blood_group='A+'):
+        return BloodRequest.objects.bulk_create(
+            BloodRequest(fname=f'r{i}', email='r@example.com', phonenum='1', age=30, reason='-',
+                         blood_group=blood_group, units=n, gender='Male')
+            for i, n in enumerate(units)
+        )
+
+    def test_policies(self):
+        reqs = self._requests(6, 2, 2, 3)
+        fifo, _ = allocation.plan(reqs, {'A+': 7}, allocation.FIFO)
+        most, short = allocation.plan(reqs, {'A+': 7}, allocation.MAX_FULFILLED)
+        self.assertEqual([req.units for req, _ in fifo], [6])
+        self.assertEqual([req.units for req, _ in most], [2, 2, 3])
+        self.assertEqual(short, [(reqs[0], 0)])
+
+    def test_substitution_spares_universal_donors(self):
+        reqs = self._requests(4, 3)
+        granted, short = allocation.plan(reqs, {'A+': 4, 'O+': 2, 'O-': 5, 'B+': 9})
+        self.assertEqual([draws for _, draws in granted], [{'A+': 4}, {'O+': 2, 'O-': 1}])
+        self.assertEqual(short, [])
+        self.assertEqual(allocation.plan(reqs, {'B+': 9})[0], [])
+        self.assertEqual(compatibility.fulfillment('A+', 3, {'A+': 1, 'O-': 2}), 'substitution')
+        self.assertIsNone(compatibility.fulfillment('O-', 1, {'O+': 5, 'A-': 5}))
+        self.assertEqual(compatibility.PREFERENCE['O-'], ['O-'])
+        self.assertTrue(compatibility.can_receive('AB+', 'O-'))
+        self.assertFalse(compatibility.can_receive('B-', 'B+'))
+
+    def test_rerunning_a_short_plan_writes_and_publishes_nothing(self):
+        inventory.receive('A+', 2)
+        self._requests(5, 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(len(allocation.allocate_pending()[1]), 2)
+        with CaptureQueriesContext(connection) as queries, mock.patch.object(events, 'rows_changed') as published:
+            self.assertEqual(len(allocation.allocate_pending()[1]), 2)
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE "blood_bank_app_bloodrequest"')])
+        published.assert_called_once_with([])
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.receive('A+', 1)
+        with mock.patch.object(events, 'rows_changed') as published:
+            allocation.allocate_pending()
+        # Both are still short, but by a different amount: the new availability is news.
+        self.assertEqual(len(published.call_args.args[0]), 2)
+
+    def test_allocates_thousands_in_one_pass(self):
+        inventory.receive('A+', 1500)
+        inventory.receive('O-', 10)
+        self._requests(*[1] * 2000)
+        self._requests(*[3] * 500, blood_group='O-')
+        start = time.perf_counter()
+        with self.captureOnCommitCallbacks(execute=True):
+            accepted, short = allocation.allocate_pending(allocation.MAX_FULFILLED)
+        elapsed = time.perf_counter() - start
+        # The O- unit left over after three O- requests goes to an A+ request.
+        self.assertEqual((len(accepted), len(short)), (1504, 996))
+        self.assertEqual(BloodRequest.objects.filter(status='Accepted').count(), 1504)
+        self.assertEqual(BloodStock.objects.get(blood_group='A+').units, 0)
+        self.assertEqual(BloodStock.objects.get(blood_group='O-').units, 0)
+        # Around a tenth of a second here; the bound only catches a return to per-request queries.
+        self.assertLess(elapsed, 5)
+
+
+class StaticAssetTests(TestCase):
+
+    def test_templates_link_stylesheets_instead_of_inlining_them(self):
+        root = os.path.join(os.path.dirname(__file__), 'templates')
+        for directory, _, files in os.walk(root):
+            for name in files:
+                with open(os.path.join(directory, name)) as template:
+                    self.assertNotIn('<style', template.read(), name)
+
+    def test_uncollected_files_fall_back_to_plain_urls(self):
+        self.assertEqual(static('css/admin/list.css'), '/static/css/admin/list.css')
+        self.assertIn('/static/css/login.css', get_template('login.html').render())
+
+
+class RoleTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('role', 'role@example.com', 'pw')
+        Credential.objects.create(user=self.user, role='Patient')
+
+    def log_in(self, role='Patient'):
+        return self.client.post(reverse('login'), {'username': 'role', 'password': 'pw', 'role': role})
+
+    def test_login_redirects_to_the_missing_profile_then_home(self):
+        self.assertRedirects(self.log_in(), reverse('patient_profile'), fetch_redirect_response=False)
+        PatientProfile.objects.create(user=self.user, full_name='r', age=30, gender='Male', blood_group='A+',
+                                      phone_number='1', address='-')
+        self.assertRedirects(self.log_in(), reverse('patienthome'), fetch_redirect_response=False)
+        self.assertContains(self.log_in('Donor'), 'Selected role doesn&#x27;t match')
+
+    def test_role_and_profile_resolve_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(roles.resolve(self.user), roles.Role('Patient', False))
+        PatientProfile.objects.create(user=self.user, full_name='r', age=30, gender='Male', blood_group='A+',
+                                      phone_number='1', address='-')
+        self.assertEqual(roles.resolve(self.user), roles.Role('Patient', True))
+        self.assertEqual(roles.resolve(User.objects.create_user('none')), roles.Role(None, False))
+
+    def test_role_is_read_from_the_session(self):
+        self.log_in()
+        request = self.client.get(reverse('request_history')).wsgi_request
+        with self.assertNumQueries(0):
+            self.assertEqual(request.role, roles.Role('Patient', False))
+
+    def test_role_pages_admit_only_their_role(self):
+        self.log_in()
+        self.assertRedirects(self.client.get(reverse('donorhome')), reverse('home'), fetch_redirect_response=False)
+        self.assertRedirects(self.client.get(reverse('admin_profile')), reverse('home'), fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse('patienthome')).status_code, 200)
+
+    def test_admin_pages_need_a_superuser_not_a_credential(self):
+        response = self.client.post(reverse('register'), {
+            'username': 'self-made', 'email': 's@example.com', 'password1': 'pw', 'password2': 'pw', 'role': 'admin',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(User.objects.filter(username='self-made').exists())
+
+        Credential.objects.filter(user=self.user).update(role='admin')
+        self.log_in('admin')
+        DonorForm.objects.create(user=self.user, firstname='d', email='d@example.com', phone='1', gender='Male',
+                                 blood_group='A+', units=1)
+        self.client.get(reverse('delete_all_donor_requests'))
+        self.assertTrue(DonorForm.objects.exists())
+        self.assertRedirects(self.client.get(reverse('admin_profile')), reverse('home'), fetch_redirect_response=False)
+
+    def test_demoted_superuser_loses_admin_pages_at_once(self):
+        admin = User.objects.create_superuser('boss', 'boss@example.com', 'pw')
+        self.client.post(reverse('login'), {'username': 'boss', 'password': 'pw', 'role': 'Admin'})
+        self.assertEqual(self.client.get(reverse('admin_profile')).status_code, 200)
+        User.objects.filter(pk=admin.pk).update(is_superuser=False)
+        self.assertRedirects(self.client.get(reverse('admin_profile')), reverse('home'), fetch_redirect_response=False)
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_login_rehashes_passwords_stored_with_other_iterations(self):
+        self.user.set_password('pw')
+        self.user.save()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.log_in()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertTrue(self.user.check_password('pw'))
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=2000)
+    def test_lowering_iterations_never_rehashes_stored_passwords(self):
+        self.user.set_password('pw')
+        self.user.save()
+        with self.settings(PASSWORD_HASH_ITERATIONS=1000):
+            self.log_in()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_login_and_registration_hash_on_the_pool(self):
+        threads = []
+
+        def record(func):
+            def wrapped(*args, **kwargs):
+                threads.append(threading.current_thread().name)
+                return func(*args, **kwargs)
+            return wrapped
+
+        with mock.patch.object(hashers.hashers, 'verify_password', record(hashers.hashers.verify_password)), \
+                mock.patch.object(hashers.hashers, 'make_password', record(hashers.hashers.make_password)):
+            self.client.post(reverse('register'), {
+                'username': 'new', 'email': 'n@example.com', 'password1': 'pw', 'password2': 'pw', 'role': 'Donor',
+            })
+            self.assertEqual(self.client.post(reverse('login'), {
+                'username': 'new', 'password': 'pw', 'role': 'Donor',
+            }).status_code, 302)
+            self.assertContains(self.client.post(reverse('login'), {
+                'username': 'nobody', 'password': 'pw', 'role': 'Donor',
+            }), 'Invalid username or password')
+        self.assertEqual(User.objects.get(username='new').credential.role, 'Donor')
+        self.assertEqual(len(threads), 3)
+        self.assertTrue(all(name.startswith('password-hash') for name in threads), threads)
+
+    def test_superuser_lookup_is_cached_until_users_change(self):
+        self.client.get(reverse('login'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('login'))
+        admin = User.objects.create_superuser('boss', 'boss@example.com', 'pw')
+        self.assertEqual(roles.admin_user(), admin)
+
+
+class StockSnapshotTests(TestCase):
+
+    def test_warm_snapshot_only_reads_the_version_and_writes_invalidate_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.receive('B-', 4)
+        stock_snapshot()
+        with self.assertNumQueries(1):
+            warm = stock_snapshot()
+        self.assertEqual([(s['blood_group'], s['units']) for s in warm.stocks], [('B-', 4)])
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.receive('B-', 2)
+        fresh = stock_snapshot()
+        self.assertNotEqual(fresh.version, warm.version)
+        self.assertEqual(fresh.stocks[0]['units'], 6)
+
+    def test_writes_from_another_process_invalidate_the_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.receive('A-', 3)
+        warm = stock_snapshot()
+        # Another worker's write: the row and the shared version, nothing in this process.
+        BloodStock.objects.filter(blood_group='A-').update(units=9)
+        bump_version(STOCK_VERSION)
+        fresh = stock_snapshot()
+        self.assertNotEqual(fresh.version, warm.version)
+        self.assertEqual(fresh.stocks[0]['units'], 9)
+
+    def test_cached_stock_table_follows_the_stock_version(self):
+        user = User.objects.create_user('frag', 'frag@example.com', 'pw')
+        Credential.objects.create(user=user, role='Patient')
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.receive('AB-', 7)
+        self.assertContains(self.client.get(reverse('patienthome')), '<td>7</td>')
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.receive('AB-', 5)
+        self.assertContains(self.client.get(reverse('patienthome')), '<td>12</td>')
+
+
+class ChartTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_superuser('chart', 'chart@example.com', 'pw'))
+
+    def test_one_render_per_stock_version(self):
+        renderer = mock.Mock(return_value=b'<svg/>')
+        with mock.patch.dict(charts.RENDERERS, {'svg': renderer}):
+            first = get_stock_version()
+            charts.get_stock_chart()
+            charts.get_stock_chart()
+            self.assertEqual(renderer.call_count, 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                inventory.receive('A+', 3)
+            second = get_stock_version()
+            charts.get_stock_chart()
+            charts.get_stock_chart()
+        self.assertNotEqual(first, second)
+        self.assertEqual(renderer.call_count, 2)
+        self.assertEqual(renderer.call_args.args[0]['A+'], 3)
+        self.assertIsNotNone(cache.get(f'blood_stock:chart:svg:{first}'))
+        self.assertIsNotNone(cache.get(f'blood_stock:chart:svg:{second}'))
+
+    def test_chart_urls_revalidate_unless_pinned_to_the_version(self):
+        url = reverse('stock_chart')
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        pinned = self.client.get(url, {'v': get_stock_version()})
+        self.assertEqual(pinned['Cache-Control'], 'private, max-age=31536000, immutable')
+        self.assertEqual(self.client.get(url, {'v': 'stale'})['Cache-Control'], 'private, no-cache')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.receive('A+', 3)
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], response['ETag'])
+
+    def test_booting_the_views_does_not_import_matplotlib(self):
+        from .management.commands.bench_startup import BOOT_SCRIPT, HEAVY_MODULES
+
+        result = subprocess.run(
+            [sys.executable, '-c', BOOT_SCRIPT], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(set(result.stdout.split()).intersection(HEAVY_MODULES), set())
+
+    def test_png_of_empty_stock_is_a_grey_disc(self):
+        response = self.client.get(reverse('stock_chart_png'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+
+    def test_svg_for_empty_stock_and_a_single_group(self):
+        empty = charts.render_stock_svg(dict.fromkeys(sharedstock.GROUPS, 0))
+        self.assertIn('fill="#EEEEEE"', empty)
+        self.assertNotIn('<path', empty)
+        single = charts.render_stock_svg({**dict.fromkeys(sharedstock.GROUPS, 0), 'O-': 5})
+        # A single group is a whole disc, not a degenerate 360 degree arc.
+        self.assertEqual(single.count('<circle'), 1)
+        self.assertNotIn('<path', single)
+        self.assertIn('O- : 5 ml', single)
+        for document in (empty, single, charts.render_stock_svg({'A+': 1, 'B+': 3}, kind='bar')):
+            parseString(document)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cond', 'cond@example.com', 'pw')
+        self.client.force_login(self.user)
+        self.req = BloodRequest.objects.create(user=self.user, fname='c', email='c@example.com', phonenum='1',
+                                               age=30, reason='-', blood_group='A+', units=1, gender='Male')
+
+    def test_unchanged_history_is_not_modified_until_a_row_changes(self):
+        url = reverse('request_history')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.reject_requests([self.req.pk])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_stock_page_follows_the_stock_version(self):
+        url = reverse('hospitalstock')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.receive('A+', 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SharedStockTests(TestCase):
+
+    def setUp(self):
+        self.block = sharedstock.SharedStock(f'blood_bank_test_{os.getpid()}')
+        self.addCleanup(self.block.close, unlink=True)
+
+    def test_readers_never_see_a_torn_write(self):
+        self.assertIsNone(self.block.read())
+        self.block.write({}, version=0)
+        done = threading.Event()
+        torn = []
+
+        def writer():
+            for version in range(1, 2000):
+                self.block.write(dict.fromkeys(sharedstock.GROUPS, version), version=version)
+            done.set()
+
+        def reader():
+            while not done.is_set():
+                version, totals = self.block.read()
+                if set(totals.values()) != {version} and version:
+                    torn.append((version, totals))
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(torn, [])
+        self.assertEqual(self.block.read()[0], 1999)
+
+    def test_stock_reads_fall_back_to_the_database_while_the_block_is_stuck(self):
+        name = f'blood_bank_test_stock_{os.getpid()}'
+        self.addCleanup(lambda: sharedstock._blocks.pop(name).close(unlink=True))
+        with self.settings(STOCK_SHM_NAME=name):
+            with self.captureOnCommitCallbacks(execute=True):
+                inventory.receive('A+', 5)
+            self.assertEqual(get_stock_version(), read_version(STOCK_VERSION))
+            self.assertEqual(stock_totals()['A+'], 5)
+
+            # A writer that died after making the sequence odd.
+            block = sharedstock.attach(name)
+            sharedstock._SEQUENCE.pack_into(block._buf, 0, sharedstock._SEQUENCE.unpack_from(block._buf, 0)[0] + 1)
+            with self.assertLogs('blood_bank_app.sharedstock', 'WARNING'):
+                self.assertEqual(get_stock_version(), read_version(STOCK_VERSION))
+                self.assertEqual(stock_totals()['A+'], 5)
+
+            # The next publish repairs the block.
+            with self.captureOnCommitCallbacks(execute=True):
+                inventory.receive('A+', 2)
+            self.assertEqual(block.read(), (read_version(STOCK_VERSION), stock_totals()))
+            self.assertEqual(stock_totals()['A+'], 7)
+
+
+class ReservationTests(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.receive('A+', 5)
+        self.first, self.second = BloodRequest.objects.bulk_create(
+            BloodRequest(fname=f'h{i}', email='h@example.com', phonenum='1', age=30, reason='-',
+                         blood_group='A+', units=4, gender='Male')
+            for i in range(2)
+        )
+
+    def test_hold_keeps_units_for_its_request(self):
+        reservations.place_hold(self.first)
+        self.assertEqual(reservations.available_balances(), {'A+': 1})
+        with self.assertRaises(inventory.InsufficientStock):
+            reservations.place_hold(self.second)
+        self.assertEqual(allocation.serve([self.second])[0], [])
+        self.assertEqual(allocation.serve([self.first])[0], [self.first])
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_expired_holds_are_ignored_and_reclaimed(self):
+        reservations.place_hold(self.first, ttl=-1)
+        self.assertEqual(reservations.available_balances(), {'A+': 5})
+        reservations.place_hold(self.second)
+        self.assertEqual(list(StockHold.objects.values_list('request', flat=True)), [self.second.pk])
+
+
+class SchedulerTests(TestCase):
+
+    def setUp(self):
+        # Rolled-back test rows never reach the index, but their ids get reused.
+        scheduler.queue.invalidate()
+
+    def _create(self, units, urgency=BloodRequest.ROUTINE, blood_group='A+'):
+        with self.captureOnCommitCallbacks(execute=True):
+            req = BloodRequest.objects.create(fname='s', email='s@example.com', phonenum='1', age=30, reason='-',
+                                              blood_group=blood_group, units=units, gender='Male', urgency=urgency)
+            scheduler.queue.changed([req])
+        return req
+
+    def test_orders_by_urgency_then_availability_then_age(self):
+        inventory.receive('A+', 2)
+        too_big = self._create(5)
+        servable = self._create(2)
+        emergency = self._create(9, BloodRequest.EMERGENCY)
+        rows, total = scheduler.pending_page(inventory.live_balances(), 10)
+        self.assertEqual(rows, [emergency, servable, too_big])
+        self.assertEqual(total, 3)
+
+    def test_writes_update_the_index_in_place(self):
+        first = self._create(1)
+        scheduler.queue.top({}, 10)
+        second = self._create(1, BloodRequest.URGENT)
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.reject_requests([first.pk])
+        # Only the shared version is read; the index itself is current.
+        with self.assertNumQueries(1):
+            entries, total = scheduler.queue.top({}, 10)
+        self.assertEqual([entry.pk for entry in entries], [second.pk])
+
+    def test_writes_from_another_process_reload_the_index(self):
+        self._create(1)
+        scheduler.queue.top({}, 10)
+        # Another worker's write: the row and a bump of the shared version, nothing in this index.
+        BloodRequest.objects.create(fname='o', email='o@example.com', phonenum='1', age=30, reason='-',
+                                    blood_group='O+', units=1, gender='Male')
+        bump_version(scheduler.QUEUE_VERSION)
+        self.assertEqual(scheduler.queue.top({}, 10)[1], 2)
+
+    def test_admin_page_defaults_to_the_queue_and_pages_through_it(self):
+        self.client.force_login(User.objects.create_superuser('queue-admin', 'qa@example.com', 'pw'))
+        with self.captureOnCommitCallbacks(execute=True):
+            reqs = BloodRequest.objects.bulk_create(
+                BloodRequest(fname=f'p{i}', email='p@example.com', phonenum='1', age=30, reason='-',
+                             blood_group='A+', units=1, gender='Male', urgency=BloodRequest.URGENT * (i % 2))
+                for i in range(PAGE_SIZE + 10)
+            )
+            scheduler.queue.changed(reqs)
+        ranked = sorted(reqs, key=lambda req: (-req.urgency, req.created_at, req.pk))
+        url = reverse('admin_blood_request')
+        first = self.client.get(url).context['page']
+        self.assertEqual(list(first), ranked[:PAGE_SIZE])
+        self.assertEqual((first.start_index, first.end_index, first.has_previous), (1, PAGE_SIZE, False))
+        second = self.client.get(f'{url}?{first.next_query()}').context['page']
+        self.assertEqual(list(second), ranked[PAGE_SIZE:])
+        self.assertFalse(second.has_next)
+        self.assertEqual(second.previous_query(), 'status=Pending&offset=0')
+        everything = self.client.get(url, {'status': ''}).context['page']
+        self.assertNotIn('status=Pending', everything.next_query())
+
+    def test_request_submitted_through_the_form_shows_in_the_pending_queue(self):
+        admin = User.objects.create_superuser('queue-admin', 'qa@example.com', 'pw')
+        self.client.force_login(admin)
+        url = reverse('admin_blood_request') + '?status=Pending'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        patient = Client()
+        patient.force_login(User.objects.create_user('queue-patient', 'qp@example.com', 'pw'))
+        with self.captureOnCommitCallbacks(execute=True):
+            patient.post(reverse('requestform'), {
+                'fname': 'q', 'email': 'qp@example.com', 'phonenum': '1', 'age': '30', 'reason': '-',
+                'blood_group': 'B+', 'units': '2', 'gender': 'Male', 'urgency': str(BloodRequest.URGENT),
+            })
+        response = self.client.get(url)
+        self.assertEqual([req.units for req in response.context['requests']], [2])
+
+
+@skipIf(connection.vendor == 'sqlite' and connection.is_in_memory_db(), "Needs a file-backed database.")
+class EventStreamTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('sse', 'sse@example.com', 'pw')
+        self.client.force_login(self.user)
+        self.req = BloodRequest.objects.create(user=self.user, fname='s', email='s@example.com', phonenum='1',
+                                               age=30, reason='-', blood_group='A+', units=1, gender='Male')
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.session.session_key}'
+        self.scope = {'type': 'http', 'method': 'GET', 'path': events.EVENTS_PATH,
+                      'headers': [(b'cookie', cookie.encode())]}
+
+    def reject(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.reject_requests([self.req.pk])
+
+    def receive_stock(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.receive('B+', 3)
+
+    async def test_stream_pushes_status_changes_and_stock_deltas(self):
+        stream = ApplicationCommunicator(events.sse_application, self.scope)
+        await stream.send_input({'type': 'http.request'})
+        self.assertEqual((await stream.receive_output(5))['status'], 200)
+        self.assertTrue((await stream.receive_output(5))['body'].startswith(b'event: stock\n'))
+
+        await sync_to_async(self.reject)()
+        body = (await stream.receive_output(5))['body']
+        self.assertIn(b'event: status\n', body)
+        self.assertIn(f'"id": {self.req.pk}, "status": "Rejected"'.encode(), body)
+
+        await sync_to_async(self.receive_stock)()
+        self.assertIn(b'"changes": {"B+": 3}', (await stream.receive_output(5))['body'])
+
+        await stream.send_input({'type': 'http.disconnect'})
+        await stream.wait(5)
+        self.assertFalse(events.broker.has_subscribers(events.user_channel(self.user.pk)))
+
+    async def test_pages_subscribe_only_when_served_over_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        for url in [reverse('request_history'), reverse('hospital_request_history'), reverse('hospitalstock')]:
+            wsgi = await sync_to_async(self.client.get)(url)
+            self.assertNotContains(wsgi, 'EventSource')
+            self.assertContains(await self.async_client.get(url), f"new EventSource('{events.EVENTS_PATH}')")
+
+    async def test_anonymous_clients_are_refused(self):
+        stream = ApplicationCommunicator(events.sse_application, {**self.scope, 'headers': []})
+        await stream.send_input({'type': 'http.request'})
+        self.assertEqual((await stream.receive_output(5))['status'], 403)
+
+
+class ConcurrentStockTests(TransactionTestCase):
+    """Stress the stock mutations from several threads, each with its own connection."""
+    threads = 8
+    rounds = 25
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # WAL is stored in the file, so every thread's connection to the test database uses it.
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+
+    def _hammer(self, work):
+        errors = []
+        barrier = threading.Barrier(self.threads)
+
+        def run(worker):
+            try:
+                barrier.wait()
+                for i in range(self.rounds):
+                    work(worker, i)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        pool = [threading.Thread(target=run, args=(n,)) for n in range(self.threads)]
+        start = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return time.perf_counter() - start, errors
+
+    def assertBalance(self, blood_group, units):
+        self.assertEqual(BloodStock.objects.get(blood_group=blood_group).units, units)
+        lots = BloodLot.objects.filter(blood_group=blood_group).aggregate(total=Sum('remaining'))['total']
+        self.assertEqual(lots, units)
+
+    def test_no_lost_updates(self):
+        for _ in range(20):
+            inventory.receive('A+', 10)
+
+        def work(worker, i):
+            if worker % 2:
+                inventory.allocate('A+', 2)
+            else:
+                inventory.receive('A+', 1)
+
+        _, errors = self._hammer(work)
+        self.assertEqual(errors, [])
+        half = self.threads // 2 * self.rounds
+        self.assertBalance('A+', 200 - half * 2 + half)
+
+    def test_never_overdraws(self):
+        inventory.receive('O-', 100)
+        granted = []
+
+        def work(worker, i):
+            try:
+                inventory.allocate('O-', 3)
+                granted.append(3)
+            except inventory.InsufficientStock:
+                pass
+
+        _, errors = self._hammer(work)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(granted), 100 // 3)
+        self.assertBalance('O-', 100 - sum(granted))
+
+    def test_approval_throughput(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        total = self.threads * self.rounds
+        inventory.receive('B+', total)
+        pending = list(BloodRequest.objects.bulk_create(
+            BloodRequest(fname=f'p{i}', email='p@example.com', phonenum='1', age=30, reason='-',
+                         blood_group='B+', units=1, gender='Male')
+            for i in range(total)
+        ))
+        clients = []
+        for _ in range(self.threads):
+            client = Client()
+            client.force_login(admin)
+            clients.append(client)
+
+        def work(worker, i):
+            req = pending[worker * self.rounds + i]
+            clients[worker].get(reverse('approve_request', args=[req.pk]))
+
+        elapsed, errors = self._hammer(work)
+        self.assertEqual(errors, [])
+        self.assertEqual(BloodRequest.objects.filter(status='Accepted').count(), total)
+        self.assertBalance('B+', 0)
+        # A few seconds here; the bound only catches approvals serialising on lock timeouts.
+        self.assertLess(elapsed, 60)
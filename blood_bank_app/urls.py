@@ -11,6 +11,8 @@ urlpatterns = [
     path('logout/', views.user_logout, name='logout'),
     path('', views.index, name='home'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('charts/stock.svg', views.stock_chart, name='stock_chart'),
+    path('charts/stock.png', views.stock_chart, {'fmt': 'png'}, name='stock_chart_png'),
     path('stock_details/', views.stock_details, name='stock_details'),
     path('bloodstock/add/', views.add_blood_stock, name='add_blood_stock'),
     path('bloodstock/update/<int:stock_id>/', views.update_blood_stock, name='update_blood_stock'),
@@ -31,11 +33,15 @@ urlpatterns = [
     path('bloodrequests/approve/<int:pk>/', views.approve_request, name='approve_request'),
     path('bloodrequests/reject/<int:pk>/', views.reject_request, name='reject_request'),
     path('donors/dashboard/', views.admin_donors, name='admin_donor_dashboard'),
+    path('donors/bulk/', views.bulk_update_donor_status, name='bulk_update_donor_status'),
     path('donor/<int:donor_id>/<str:status>/', views.update_donor_status, name='update_donor_status'),
     path('history/', views.donor_history, name='donor_history'),
     path('request-history/', views.patient_request_history, name='request_history'),
     path('blood-request/', views.admin_blood_request, name='admin_blood_request'),
+    path('blood-request/allocate/', views.allocate_pending_requests, name='allocate_pending_requests'),
+    path('blood-request/bulk/', views.bulk_blood_requests, name='bulk_blood_requests'),
     path('approve-request/<int:pk>/', views.approve_request, name='approve_request'),
+    path('hold-request/<int:pk>/', views.hold_request, name='hold_request'),
     path('reject-request/<int:pk>/', views.reject_request, name='reject_request'),
     path('deletedonorreq/', views.delete_my_donor_requests, name='delete_my_donor_requests'),
     path('deletealldonors/', views.delete_all_donor_requests, name='delete_all_donor_requests'),
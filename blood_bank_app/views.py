@@ -1,79 +1,98 @@
-import base64
 from datetime import date
-import io
-from matplotlib import pyplot as plt
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, HttpResponseNotModified
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Sum
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import login, logout
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
+from django.utils.http import parse_etags
 from datetime import date, timedelta
+from . import allocation, bulk, compatibility, counters, events, hashers, inventory, reservations, roles, scheduler
+from .conditional import history_condition, stock_condition
+from .expiry import with_expiry_state
 from .forms import UserRegistrationForm, HospitalForm, PatientProfileForm, DonorBasicForm, DonorEligibilityForm
+from .pagination import PAGE_SIZE, OffsetPage, keyset_paginate, list_filters, page_offset
+from .snapshot import stock_snapshot
+from .metrics import admin_dashboard_metrics, donor_home_metrics, hospital_home_metrics, patient_home_metrics
 from .models import (
-    BloodRequest, BloodStock, DonorForm, Credential, HospitalDetails, PatientProfile, DonorProfile
+    BloodRequest, BloodStock, DonorForm, Credential, HospitalDetails, PatientProfile, DonorProfile,
+    BLOOD_GROUP_CHOICES, get_stock_version,
 )
 
 User = get_user_model()
 
 
-def register(request):
+async def register(request):
+    # Async so the password hash is awaited on the bounded hash pool.
     if request.method == "POST":
         form = UserRegistrationForm(request.POST)
-        if form.is_valid():
-            user = form.save()
-            Credential.objects.create(user=user, role=form.cleaned_data['role'])
+        if await sync_to_async(form.is_valid)():
+            encoded = await hashers.amake_password(form.cleaned_data['password1'])
+            await sync_to_async(_create_account)(form, encoded)
             return redirect('login')
     else:
         form = UserRegistrationForm()
-    return render(request, 'register.html', {'form': form})
-
-
-def user_login(request):
-    admin_user = User.objects.filter(is_superuser=True).first()
-    if request.method == "POST":
-        username = request.POST.get('username')
-        password = request.POST.get('password')
-        selected_role = request.POST.get('role')
-        user = authenticate(request, username=username, password=password)
-        if user:
-            if user.is_superuser and selected_role == 'Admin':
-                login(request, user)
-                return redirect('dashboard')
-            role = getattr(user.credential, 'role', None)
-            if role == selected_role:
-                login(request, user)
-                if role == 'Hospital':
-                    hospital_profile_exists = HospitalDetails.objects.filter(user=user).exists()
-                    if not hospital_profile_exists:
-                        return redirect('hospital_profile')
-                    else:
-                        return redirect('hospitalhome')
-                elif role == 'Patient':
-                    from .models import PatientProfile
-                    patient_profile_exists = PatientProfile.objects.filter(user=user).exists()
-                    if not patient_profile_exists:
-                        return redirect('patient_profile')
-                    else:
-                        return redirect('patienthome')
-                elif role == 'Donor':
-                    from .models import DonorProfile
-                    donor_profile_exists = DonorProfile.objects.filter(user=user).exists()
-                    if not donor_profile_exists:
-                        return redirect('donor_profile') 
-                    else:
-                        return redirect('donorhome') 
-                return redirect('home')
-            else:
-                return render(request, "login.html", {
-                    'error': "Selected role doesn't match your account.",
-                    'admin_user': admin_user
-                })
-        return render(request, "login.html", {
-            'error': 'Invalid username or password',
-            'admin_user': admin_user
-        })
-    return render(request, "login.html", {'admin_user': admin_user})
+    return await sync_to_async(render)(request, 'register.html', {'form': form})
+
+
+@transaction.atomic
+def _create_account(form, encoded_password):
+    user = form.save(encoded_password=encoded_password)
+    Credential.objects.create(user=user, role=form.cleaned_data['role'])
+
+
+# Landing page for each role: (home, profile page to fill in first).
+ROLE_PAGES = {
+    'Hospital': ('hospitalhome', 'hospital_profile'),
+    'Patient': ('patienthome', 'patient_profile'),
+    'Donor': ('donorhome', 'donor_profile'),
+}
+
+
+async def user_login(request):
+    # Async so the password check is awaited on the bounded hash pool; everything
+    # else runs synchronously around it.
+    if request.method != "POST":
+        return await sync_to_async(_login_page)(request)
+    username = request.POST.get('username')
+    user = await sync_to_async(_login_candidate)(username)
+    if not await hashers.acheck_password(user, request.POST.get('password') or ''):
+        user = None
+    return await sync_to_async(_log_in)(request, user, request.POST.get('role'))
+
+
+def _login_candidate(username):
+    """The active user named ``username``, as ModelBackend would authenticate them."""
+    user = User._default_manager.filter(**{User.USERNAME_FIELD: username}).first() if username else None
+    return user if user is not None and user.is_active else None
+
+
+def _login_page(request, error=None):
+    context = {'admin_user': roles.admin_user()}
+    if error:
+        context['error'] = error
+    return render(request, "login.html", context)
+
+
+def _log_in(request, user, selected_role):
+    if user is None:
+        return _login_page(request, 'Invalid username or password')
+    user.backend = 'django.contrib.auth.backends.ModelBackend'
+    if user.is_superuser and selected_role == 'Admin':
+        login(request, user)
+        roles.remember(request, roles.ADMIN)
+        return redirect('dashboard')
+    role = roles.resolve(user)
+    if role.name != selected_role:
+        return _login_page(request, "Selected role doesn't match your account.")
+    login(request, user)
+    roles.remember(request, role)
+    if role.name not in ROLE_PAGES:
+        return redirect('home')
+    home, profile = ROLE_PAGES[role.name]
+    return redirect(home if role.has_profile else profile)
 
 
 def user_logout(request):
@@ -89,76 +108,44 @@ def index(request):
 
 @login_required
 def dashboard(request):
-    total_units = BloodStock.objects.aggregate(total=Sum('units'))['total'] or 0
-    total_donors = DonorForm.objects.count()
-    total_blood_requests = BloodRequest.objects.filter(role__in=['Patient', 'Hospital']).count() + DonorForm.objects.count()
-    donor_approved = DonorForm.objects.filter(status='Approved').count()
-    blood_approved = BloodRequest.objects.filter(status='Accepted', role__in=['Patient', 'Hospital']).count()
-    approved_requests = donor_approved + blood_approved
-    blood_data = {group: 0 for group, _ in BloodStock.BLOOD_GROUP}
-    for stock in BloodStock.objects.all():
-        blood_data[stock.blood_group] = stock.units
-
-    labels = list(blood_data.keys())
-    sizes = list(blood_data.values())
-
-    colors = ["#A9A3C5", "#EBC8C0", "#CCDC82", "#C0E3EB", "#CDC0EB", '#EBC0DE', '#DEEBC0', "#C0EBCD"]
-
-    fig, ax = plt.subplots(figsize=(7,6), facecolor='white')
-
-    wedges, texts = ax.pie(
-        sizes,
-        colors=colors[:len(labels)],
-        startangle=90,
-        shadow=False,
-        wedgeprops={'edgecolor':'white', 'linewidth':1},
-        labels=labels,             
-        labeldistance=1.1,        
-        autopct=None,            
-        textprops={'fontsize':12, 'weight':'bold'}
-    )
-
-    ax.axis('equal')  
-
-    legend_labels = [f"{label} : {size} ml" for label, size in zip(labels, sizes)]
-    ax.legend(
-        wedges,
-        legend_labels,
-        title="Blood Stock",
-        loc="center left",
-        bbox_to_anchor=(1, 0, 0.4, 1),
-        fontsize=12,
-        title_fontsize=13
-    )
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight', transparent=True)
-    buf.seek(0)
-    chart_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    buf.close()
-    plt.close(fig)
-
-    context = {
-        'available_donors': total_donors,
-        'total_blood_units': total_units,
-        'total_requests': total_blood_requests,
-        'approved_requests': approved_requests,
-        'blood_stock': total_units,
-        'blood_chart': chart_base64,
-    }
+    context = admin_dashboard_metrics()
+    context['chart_version'] = get_stock_version()
 
     return render(request, 'admin/admin_dashboard.html', context)
 
 
+@login_required
+def stock_chart(request, fmt='svg'):
+    # Loaded on first use so worker boot does not pay for the chart module.
+    from .charts import CONTENT_TYPES, get_stock_chart
+
+    version = get_stock_version()
+    etag = f'"{fmt}-{version}"'
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            chart = get_stock_chart(version, fmt)
+        except ImportError:
+            raise Http404("PNG export requires matplotlib.")
+        response = HttpResponse(chart, content_type=CONTENT_TYPES[fmt])
+    response['ETag'] = etag
+    # Only a URL pinned to the current version may be cached forever.
+    if request.GET.get('v') == str(version):
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 # Blood Stock Views
 
 @login_required
 def blood_stock_list(request):
-    BloodStock.objects.filter(expiry_date__lt=date.today()).delete()
-
-    stocks = BloodStock.objects.all()
-    expired_stocks = [s for s in stocks if s.is_expired()]
-    near_expiry_stocks = [s for s in stocks if s.is_near_expiry()]
+    # Expired rows are retired by the expiry sweeper, not on this read path.
+    stocks = list(with_expiry_state(BloodStock.objects.all()))
+    expired_stocks = [s for s in stocks if s.expiry_state == 'expired']
+    near_expiry_stocks = [s for s in stocks if s.expiry_state == 'near']
 
     context = {
         'stocks': stocks,
@@ -174,32 +161,32 @@ def add_blood_stock(request):
     if request.method == 'POST':
         blood_group = request.POST.get('blood_group')
         units = int(request.POST.get('units', 0))
-        if blood_group:
-            stock, created = BloodStock.objects.get_or_create(blood_group=blood_group)
-            stock.units += units
-            stock.save()
+        if blood_group and units > 0:
+            inventory.receive(blood_group, units)
         return redirect('blood_stock_list')
     return render(request, 'admin/add_blood_stock.html')
 
 @login_required
 def update_blood_stock(request, stock_id):
     stock = get_object_or_404(BloodStock, id=stock_id)
+    # Shown from the live lots set_balance adjusts, not the cached row, which can still
+    # count lots that expired since the sweeper last ran.
+    stock.units = inventory.available_units(stock.blood_group)
     if request.method == 'POST':
-        stock.units = int(request.POST.get('units', stock.units))
-        stock.save()
+        inventory.set_balance(stock.blood_group, int(request.POST.get('units', stock.units)))
         return redirect('blood_stock_list')
     return render(request, 'admin/update_blood_stock.html', {'stock': stock})
 
 @login_required
 def delete_blood_stock(request, stock_id):
     stock = get_object_or_404(BloodStock, id=stock_id)
-    stock.delete()
+    inventory.discard_group(stock.blood_group)
     return redirect('blood_stock_list')
 
 @login_required
+@stock_condition
 def stock_details(request):
-    stocks = BloodStock.objects.all().order_by('blood_group')
-    return render(request, 'patient/stock_details.html', {'stocks': stocks})
+    return render(request, 'patient/stock_details.html', {'stocks': stock_snapshot().stocks})
 
 #Donor views
 
@@ -209,65 +196,45 @@ def donate_form(request):
         return redirect('login')
 
     if request.method == "POST":
-        DonorForm.objects.create(
-            user=request.user,
-            firstname=request.POST.get('fname'),
-            # email=request.user.get('email'),
-            email=request.user.email,
-            phone=request.POST.get('phonenum'),
-            age=request.POST.get('age'),
-            blood_group=request.POST.get('blood_group'),
-            units=request.POST.get('units'),
-            gender=request.POST.get('gender'),
-            last_donate_date=request.POST.get('donatedate') or None,
-            last_receive_date=request.POST.get('recieveddate') or None,
-            consent=request.POST.get('consent') == 'on',
-            status='Pending'
-        )
+        with transaction.atomic():
+            donor = DonorForm.objects.create(
+                user=request.user,
+                firstname=request.POST.get('fname'),
+                # email=request.user.get('email'),
+                email=request.user.email,
+                phone=request.POST.get('phonenum'),
+                age=request.POST.get('age'),
+                blood_group=request.POST.get('blood_group'),
+                units=request.POST.get('units'),
+                gender=request.POST.get('gender'),
+                last_donate_date=request.POST.get('donatedate') or None,
+                last_receive_date=request.POST.get('recieveddate') or None,
+                consent=request.POST.get('consent') == 'on',
+                status='Pending'
+            )
+            counters.donor_form_changed(donor, None)
         return redirect('donor_history')
 
     return render(request, 'donor/donate_form.html')
 
 
 @login_required
+@roles.role_required('Donor')
 def donor_home(request):
-    donor_records = DonorForm.objects.filter(user=request.user)
-    context = {
-        'total_requests': donor_records.count(),
-        'pending_requests': donor_records.filter(status='Pending').count(),
-        'approved_requests': donor_records.filter(status='Approved').count(),
-        'rejected_requests': donor_records.filter(status='Rejected').count(),
-        'stocks': BloodStock.objects.all().order_by('blood_group'),
-    }
+    context = donor_home_metrics(request.user)
+    context['stocks'] = stock_snapshot().stocks
     return render(request, 'donor/donor_home.html', context)
 
-@login_required
-def admin_donors(request):
-    donors = DonorForm.objects.all().order_by('-id')
-    return render(request, 'admin/admin_donors.html', {'donors': donors})
-
 @login_required
 def delete_all_donor_requests(request):
-    if request.user.is_superuser:  
-        DonorForm.objects.all().delete()
+    if request.user.is_superuser:
+        with transaction.atomic():
+            DonorForm.objects.all().delete()
+            counters.rebuild_counters()
     return redirect('admin_donors')  
 
 @login_required
-def update_donor_status(request, donor_id, status):
-    donor = get_object_or_404(DonorForm, id=donor_id)
-    donor.status = status
-    donor.approved_by = request.user
-    donor.save()
-
-    if status == 'Approved':
-        stock, _ = BloodStock.objects.get_or_create(blood_group=donor.blood_group)
-        stock.units += donor.units
-        stock.save()
-
-    return redirect('admin_donors')
-
-
-@login_required
+@history_condition(DonorForm)
 def donor_history(request):
     if not request.user.is_authenticated:
         return redirect('login')
@@ -278,7 +245,10 @@ def donor_history(request):
 @login_required
 def delete_my_donor_requests(request):
     if request.user.is_authenticated:
-        DonorForm.objects.filter(email=request.user.email).delete()
+        with transaction.atomic():
+            donor_records = DonorForm.objects.filter(email=request.user.email)
+            counters.donor_forms_deleted(donor_records)
+            donor_records.delete()
     return redirect('donor_history')
 
 
@@ -286,39 +256,46 @@ def delete_my_donor_requests(request):
 # Patient Views
 
 @login_required
+@roles.role_required('Patient')
 def patient_home(request):
-    patient_requests = BloodRequest.objects.filter(user=request.user)
-
-    context = {
-        'stocks': BloodStock.objects.all().order_by('blood_group'),
-        'total_requests': patient_requests.count(),
-        'pending_requests': patient_requests.filter(status='Pending').count(),
-        'approved_requests': patient_requests.filter(status='Accepted').count(),
-        'rejected_requests': patient_requests.filter(status='Rejected').count(),
-        'username': request.user.username,
-    }
+    context = patient_home_metrics(request.user)
+    snapshot = stock_snapshot()
+    context['stocks'] = snapshot.stocks
+    # Keys the cached stock table fragment.
+    context['stock_version'] = snapshot.version
+    context['username'] = request.user.username
     return render(request, 'patient/patient_home.html', context)
 
+def _urgency(request):
+    urgency = request.POST.get('urgency', '')
+    choices = {value for value, _ in BloodRequest.URGENCY_CHOICES}
+    return int(urgency) if urgency.isdigit() and int(urgency) in choices else BloodRequest.ROUTINE
+
 @login_required
 def request_form(request):
     if request.method == 'POST':
-        BloodRequest.objects.create(
-            user=request.user if request.user.is_authenticated else None,
-            fname=request.POST.get('fname'),
-            email=request.POST.get('email'),
-            phonenum=request.POST.get('phonenum'),
-            age=request.POST.get('age'),
-            reason=request.POST.get('reason'),
-            blood_group=request.POST.get('blood_group'),
-            units=request.POST.get('units'),
-            gender=request.POST.get('gender'),
-            role='Patient',
-            status='Pending'
-        )
+        with transaction.atomic():
+            blood_request = BloodRequest.objects.create(
+                user=request.user if request.user.is_authenticated else None,
+                fname=request.POST.get('fname'),
+                email=request.POST.get('email'),
+                phonenum=request.POST.get('phonenum'),
+                age=request.POST.get('age'),
+                reason=request.POST.get('reason'),
+                blood_group=request.POST.get('blood_group'),
+                units=request.POST.get('units'),
+                gender=request.POST.get('gender'),
+                role='Patient',
+                urgency=_urgency(request),
+                status='Pending'
+            )
+            counters.blood_request_changed(blood_request, None)
+            scheduler.queue.changed([blood_request])
         return redirect('patienthome')
     return render(request, 'patient/request_form.html')
 
 @login_required
+@history_condition(BloodRequest)
 def patient_request_history(request):
     requests = BloodRequest.objects.filter(user=request.user).order_by('-created_at')
     return render(request, 'patient/request_history.html', {'requests': requests})
@@ -327,141 +304,184 @@ def patient_request_history(request):
 
 @login_required
 def admin_blood_request(request):
-    requests_list = BloodRequest.objects.filter(role__in=['Patient', 'Hospital']).order_by('-created_at')
-    return render(request, 'admin/admin_blood_request.html', {'requests': requests_list})
+    filters = list_filters(request, 'blood_group')
+    # Pending work is what this page is for, so it is the default; "All statuses"
+    # sends an empty status, which the page links carry along.
+    status = request.GET.get('status', 'Pending')
+    params = {**filters, 'status': status}
+    if status:
+        filters['status'] = status
+    # Every BloodRequest is a Patient or Hospital request (ROLE_CHOICES); filtering on
+    # role here would only steer SQLite away from the (created_at, id) index.
+    balances = reservations.available_balances()
+    if status == 'Pending':
+        # The pending queue is served in priority order from the in-memory index.
+        offset = page_offset(request)
+        rows, pending_total = scheduler.pending_page(balances, PAGE_SIZE, filters.get('blood_group'), offset)
+        requests_list = OffsetPage(rows, offset, pending_total, params)
+    else:
+        requests_list = keyset_paginate(request, BloodRequest.objects.filter(**filters), params=params)
+        pending_total = None
+    held_until = reservations.holds_for([req for req in requests_list if req.status == 'Pending'])
+    for req in requests_list:
+        if req.status == 'Pending':
+            req.held_until = held_until.get(req.pk)
+            req.fulfillment = compatibility.fulfillment(req.blood_group, req.units, balances)
+    return render(request, 'admin/admin_blood_request.html', {
+        'requests': requests_list,
+        'page': requests_list,
+        'filters': filters,
+        'status_choices': ['Pending', 'Accepted', 'Rejected'],
+        'blood_groups': [group for group, _ in BLOOD_GROUP_CHOICES],
+        'allocation_policies': allocation.POLICY_CHOICES,
+        'pending_total': pending_total,
+    })
 
 
 @login_required
+@transaction.atomic
 def approve_request(request, pk):
     req = get_object_or_404(BloodRequest, pk=pk)
-    stock, _ = BloodStock.objects.get_or_create(blood_group=req.blood_group)
+    old_status = req.status
     units = int(req.units)
     if req.role == 'Donor':
-        stock.units += units
+        inventory.receive(req.blood_group, units)
         req.status = 'Accepted'
         donor = DonorForm.objects.filter(email=req.email, units=req.units, blood_group=req.blood_group).first()
         if donor:
+            old_donor_status = donor.status
             donor.status = 'Approved'
             donor.save()
+            counters.donor_form_changed(donor, old_donor_status)
+            events.rows_changed([donor])
         messages.success(request, f"Donor request approved and {units} units added to stock.")
     else:
-        if stock.units >= units:
-            stock.units -= units
-            req.status = 'Accepted'
-            req.admin_message = f"{units} units of {req.blood_group} provided successfully."
-            messages.success(request, f"Blood request approved. {units} units of {req.blood_group} provided.")
-        else:
-            req.status = 'Pending'
-            req.admin_message = (
-                f"⚠️ Not enough {req.blood_group} stock available. "
-                f"Requested: {units}, Available: {stock.units}. Please try again later."
-            )
+        try:
+            accepted, _ = allocation.serve([req])
+        except inventory.InsufficientStock:
+            accepted = []
+        if not accepted:
             messages.warning(request, f"⚠️ Not enough {req.blood_group} stock available. Request kept pending.")
-            req.save()
-            return redirect('admin_blood_request')
+        else:
+            messages.success(request, f"Blood request approved. {req.admin_message}")
+        return redirect('admin_blood_request')
 
-    stock.save()
     req.save()
+    counters.blood_request_changed(req, old_status)
+    scheduler.queue.changed([req])
+    events.rows_changed([req])
+    return redirect('admin_blood_request')
+
+@login_required
+def hold_request(request, pk):
+    req = get_object_or_404(BloodRequest, pk=pk, status='Pending')
+    try:
+        hold = reservations.place_hold(req, request.user)
+    except inventory.InsufficientStock as shortage:
+        messages.warning(request, f"⚠️ Only {shortage.available} units of {req.blood_group} are free to hold.")
+    else:
+        messages.success(request, f"{hold.units} units of {hold.blood_group} held until {hold.expires_at:%H:%M}.")
     return redirect('admin_blood_request')
 
 @login_required
+@transaction.atomic
 def reject_request(request, pk):
     req = get_object_or_404(BloodRequest, pk=pk)
+    old_status = req.status
     req.status = 'Rejected'
     req.save()
+    counters.blood_request_changed(req, old_status)
+    reservations.release([req])
+    scheduler.queue.changed([req])
+    events.rows_changed([req])
 
     if req.role == 'Donor':
         donor = DonorForm.objects.filter(email=req.email, units=req.units, blood_group=req.blood_group).first()
         if donor:
+            old_donor_status = donor.status
             donor.status = 'Rejected'
             donor.save()
+            counters.donor_form_changed(donor, old_donor_status)
+            events.rows_changed([donor])
+    return redirect('admin_blood_request')
+
+@login_required
+def bulk_blood_requests(request):
+    ids = bulk.parse_ids(request.POST.getlist('ids'))
+    action = request.POST.get('action')
+    if request.method == 'POST' and ids and action == 'approve':
+        try:
+            accepted, short = bulk.approve_requests(ids)
+        except inventory.InsufficientStock:
+            messages.warning(request, "⚠️ Stock changed while approving. Nothing was changed, please try again.")
+            return redirect('admin_blood_request')
+        if accepted:
+            messages.success(request, f"{len(accepted)} blood requests approved.")
+        if short:
+            messages.warning(request, f"⚠️ Not enough stock for {len(short)} requests. They were kept pending.")
+    elif request.method == 'POST' and ids and action == 'reject':
+        rejected = bulk.reject_requests(ids)
+        messages.success(request, f"{len(rejected)} blood requests rejected.")
+    return redirect('admin_blood_request')
+
+@login_required
+def allocate_pending_requests(request):
+    policy = request.POST.get('policy', allocation.FIFO)
+    if request.method == 'POST' and policy in allocation.POLICIES:
+        try:
+            accepted, short = allocation.allocate_pending(policy)
+        except inventory.InsufficientStock:
+            messages.warning(request, "⚠️ Stock changed while allocating. Nothing was changed, please try again.")
+            return redirect('admin_blood_request')
+        messages.success(request, f"{len(accepted)} blood requests approved from current stock.")
+        if short:
+            messages.warning(request, f"⚠️ {len(short)} requests could not be covered and were kept pending.")
     return redirect('admin_blood_request')
 
 # Hospital Views
 
 @login_required
+@roles.role_required('Hospital')
 def hospital_home(request):
-    hospital_requests = BloodRequest.objects.filter(user=request.user, role='Hospital')
-    context = {
-        'stocks': BloodStock.objects.all().order_by('blood_group'),
-        'total_requests': hospital_requests.count(),
-        'approved_requests': hospital_requests.filter(status='Accepted').count(),
-        'available_donors': DonorForm.objects.count(),
-        'username': request.user.username,
-    }
+    context = hospital_home_metrics(request.user)
+    context['stocks'] = stock_snapshot().stocks
+    context['username'] = request.user.username
     return render(request, 'hospital/hospital_home.html', context)
 
 @login_required
 def hospital_request_form(request):
     if request.method == 'POST':
-        BloodRequest.objects.create(
-            user=request.user,
-            fname=request.POST.get('hospitalname'),
-            email=request.POST.get('email'),
-            phonenum=request.POST.get('phonenum'),
-            age=0,
-            reason=request.POST.get('address'),
-            blood_group=request.POST.get('blood_group'),
-            units=request.POST.get('units'),
-            gender='N/A', 
-            role='Hospital',
-            status='Pending',
-        )
+        with transaction.atomic():
+            blood_request = BloodRequest.objects.create(
+                user=request.user,
+                fname=request.POST.get('hospitalname'),
+                email=request.POST.get('email'),
+                phonenum=request.POST.get('phonenum'),
+                age=0,
+                reason=request.POST.get('address'),
+                blood_group=request.POST.get('blood_group'),
+                units=request.POST.get('units'),
+                gender='N/A',
+                role='Hospital',
+                urgency=_urgency(request),
+                status='Pending',
+            )
+            counters.blood_request_changed(blood_request, None)
+            scheduler.queue.changed([blood_request])
         return redirect('hospital_request_history')
     return render(request, 'hospital/hospital_request_form.html')
 
 @login_required
+@history_condition(BloodRequest)
 def hospital_request_history(request):
-    requests = BloodRequest.objects.filter(user=request.user, role='Hospital')
+    requests = BloodRequest.objects.filter(user=request.user, role='Hospital').order_by('-created_at')
     return render(request, 'hospital/hospital_request_history.html', {'requests': requests})
 
 @login_required
+@stock_condition
 def hospital_stock(request):
-    blood_data = {group: 0 for group, _ in BloodStock.BLOOD_GROUP}
-    for stock in BloodStock.objects.all():
-        blood_data[stock.blood_group] = stock.units
-
-    labels = list(blood_data.keys())
-    sizes = list(blood_data.values())
-
-    colors = ["#A9A3C5", "#EBC8C0", "#CCDC82", "#C0E3EB", "#CDC0EB", '#EBC0DE', '#DEEBC0', "#C0EBCD"]
-
-    fig, ax = plt.subplots(figsize=(7,6), facecolor='white')
-
-    wedges, texts = ax.pie(
-        sizes,
-        colors=colors[:len(labels)],
-        startangle=90,
-        shadow=False,
-        wedgeprops={'edgecolor':'white', 'linewidth':1},
-        labels=labels,             
-        labeldistance=1.1,        
-        autopct=None,            
-        textprops={'fontsize':12, 'weight':'bold'}
-    )
-
-    ax.axis('equal')  
-
-    legend_labels = [f"{label} : {size} ml" for label, size in zip(labels, sizes)]
-    ax.legend(
-        wedges,
-        legend_labels,
-        title="Blood Stock",
-        loc="center left",
-        bbox_to_anchor=(1, 0, 0.4, 1),
-        fontsize=12,
-        title_fontsize=13
-    )
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight', transparent=True)
-    buf.seek(0)
-    chart_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    buf.close()
-    plt.close(fig)
-
     context = {
-        'blood_chart': chart_base64,
+        'chart_version': get_stock_version(),
     }
 
     return render(request, 'hospital/hospital_stocks.html', context)
@@ -470,41 +490,57 @@ def hospital_stock(request):
 
 @login_required
 def admin_donors(request):
-    donors = DonorForm.objects.all().order_by('-id')
-    return render(request, 'admin/admin_donors.html', {'donors': donors})
+    filters = list_filters(request, 'status', 'blood_group')
+    donors = keyset_paginate(request, DonorForm.objects.filter(**filters), params=filters)
+    return render(request, 'admin/admin_donors.html', {
+        'donors': donors,
+        'page': donors,
+        'filters': filters,
+        'status_choices': [status for status, _ in DonorForm.STATUS_CHOICES],
+        'blood_groups': [group for group, _ in BLOOD_GROUP_CHOICES],
+    })
 
 @login_required
+@transaction.atomic
 def update_donor_status(request, donor_id, status):
     donor = get_object_or_404(DonorForm, id=donor_id)
+    old_status = donor.status
     donor.status = status
     donor.approved_by = request.user
     donor.save()
-    if status == 'Approved':
-        stock, _ = BloodStock.objects.get_or_create(blood_group=donor.blood_group)
-        stock.units += donor.units
-        stock.save()
+    counters.donor_form_changed(donor, old_status)
+    events.rows_changed([donor])
+    if status == 'Approved' and old_status != 'Approved':
+        inventory.receive(donor.blood_group, donor.units, donor=donor)
+    return redirect('admin_donor_dashboard')
+
+@login_required
+def bulk_update_donor_status(request):
+    ids = bulk.parse_ids(request.POST.getlist('ids'))
+    status = request.POST.get('status')
+    if request.method == 'POST' and ids and status in ('Approved', 'Rejected'):
+        donors = bulk.set_donor_status(ids, status, request.user)
+        messages.success(request, f"{len(donors)} donor requests {status.lower()}.")
     return redirect('admin_donor_dashboard')
 
 @login_required
 def admin_donor_list(request):
-    donor_data = DonorForm.objects.all().order_by('-id')
-    donors = Credential.objects.filter(role='Donor').select_related('user')
-    return render(request, 'admin/admin_donors_list.html', {'donordata': donor_data, 'donors': donors})
+    donors = keyset_paginate(request, Credential.objects.filter(role='Donor').select_related('user'), keys=['id'])
+    return render(request, 'admin/admin_donors_list.html', {'donors': donors, 'page': donors})
 
 @login_required
 def admin_patients(request):
-    patients = Credential.objects.filter(role='Patient').select_related('user')
-    return render(request, 'admin/admin_patients.html', {'patients': patients})
+    patients = keyset_paginate(request, Credential.objects.filter(role='Patient').select_related('user'), keys=['id'])
+    return render(request, 'admin/admin_patients.html', {'patients': patients, 'page': patients})
 
 @login_required
 def admin_hospitals(request):
-    hospitals = Credential.objects.filter(role='Hospital').select_related('user')
-    return render(request, 'admin/admin_hospitals.html', {'hospitals': hospitals})
+    hospitals = keyset_paginate(request, Credential.objects.filter(role='Hospital').select_related('user'), keys=['id'])
+    return render(request, 'admin/admin_hospitals.html', {'hospitals': hospitals, 'page': hospitals})
 
 @login_required
+@roles.role_required(roles.ADMIN.name)
 def admin_profile(request):
-    if not request.user.is_superuser:
-        return redirect('home')
     return render(request, 'admin/admin_profile.html', {'user': request.user})
 
 
@@ -518,6 +554,7 @@ def hospital_profile_view(request):
 @login_required
 def hospital_profile(request):
     hospital, _ = HospitalDetails.objects.get_or_create(user=request.user)
+    roles.profile_saved(request)
 
     if request.method == 'POST':
         form = HospitalForm(request.POST, request.FILES, instance=hospital)
@@ -554,6 +591,7 @@ def patient_profile(request):
             patient_profile = form.save(commit=False)
             patient_profile.user = request.user
             patient_profile.save()
+            roles.profile_saved(request)
             messages.success(request, "Profile saved successfully!")
             return redirect('patient_profile_view')
         else:
@@ -573,6 +611,7 @@ def patient_profile_view(request):
 @login_required
 def donor_profile(request):
     profile, _ = DonorProfile.objects.get_or_create(user=request.user)
+    roles.profile_saved(request)
 
     if request.method == 'POST':
         form = DonorBasicForm(request.POST, request.FILES, instance=profile)